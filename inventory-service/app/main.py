@@ -2,22 +2,32 @@
 
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
-from sqlmodel import Session, select
-from fastapi import FastAPI, Depends, HTTPException
-from app.models import Product
-from app.db_engine import create_db_and_tables, get_session
-from app.kafka import consume_messages, get_kafka_producer
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi import FastAPI, Depends, HTTPException, Request
+from app.models import Product, StockAdjustmentBatch
+from app.db_engine import get_pool_stats, get_read_session, get_session
+from app.kafka import consume_messages, start_kafka_producer, stop_kafka_producer
+from app.outbox import add_outbox_event, relay_stats, run_outbox_relay
+from app.pagination import PageParams, conditional_response, fetch_page, render_page
+from app.reservations import handle_inventory_command  # noqa: F401  registers the saga handler
+from app.stock import adjust_stock
+from app import settings
 import asyncio
-import json
 
 app = FastAPI()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    print("Creating tables..")
     task = asyncio.create_task(consume_messages('inventory', 'broker:19092'))
-    create_db_and_tables()
+    commands = asyncio.create_task(consume_messages(settings.CHECKOUT_INVENTORY_TOPIC, settings.BOOTSTRAP_SERVER))
+    producer = await start_kafka_producer()
+    relay = asyncio.create_task(run_outbox_relay(producer))
     yield
+    task.cancel()
+    commands.cancel()
+    relay.cancel()
+    await stop_kafka_producer()
 
 app = FastAPI(lifespan=lifespan, title="Inventory Service", version="0.0.1",
               description="This is the Inventory Service API, which handles products, warehouses, and stock management. It includes CRUD operations for managing inventory data and integrates with Kafka for real-time messaging.")
@@ -26,32 +36,42 @@ app = FastAPI(lifespan=lifespan, title="Inventory Service", version="0.0.1",
 def read_root():
     return {"Hello": "Inventory Service"}
 
+@app.get("/db/pool")
+def read_pool_stats():
+    return get_pool_stats()
+
+@app.get("/outbox/stats")
+def read_outbox_stats():
+    return relay_stats
+
 @app.post("/products/", response_model=Product)
-async def create_product(product: Product, session: Session = Depends(get_session),
-                         producer = Depends(get_kafka_producer)):
+async def create_product(product: Product, session: AsyncSession = Depends(get_session)):
     try:
-        product_dict = {field: getattr(product, field) for field in product.dict()}
-        product_json = json.dumps(product_dict).encode("utf-8")
-        await producer.send_and_wait("inventory", product_json)
         session.add(product)
-        session.commit()
-        session.refresh(product)
+        await session.flush()
+        product_dict = {field: getattr(product, field) for field in product.dict()}
+        add_outbox_event(session, "inventory", "inventory", product_dict, key=str(product.id))
+        await session.commit()
+        await session.refresh(product)
         return product
     except HTTPException as e:
         raise e
 
 @app.get("/products/", response_model=list[Product])
-def read_products(session: Session = Depends(get_session)):
+async def read_products(request: Request, session: AsyncSession = Depends(get_read_session),
+                        page: PageParams = Depends()):
     try:
-        products = session.exec(select(Product)).all()
-        return products
+        # Stock moves often, so pages aren't cached; an unchanged page still
+        # costs the client a 304 instead of the whole list.
+        rows, next_cursor = await fetch_page(session, Product, page)
+        return conditional_response(request, *render_page(rows, next_cursor))
     except HTTPException as e:
         raise e
 
 @app.get("/products/{product_id}", response_model=Product)
-def read_product(product_id: int, session: Session = Depends(get_session)):
+async def read_product(product_id: int, session: AsyncSession = Depends(get_read_session)):
     try:
-        product = session.exec(select(Product).filter(Product.id == product_id)).first()
+        product = (await session.exec(select(Product).filter(Product.id == product_id))).first()
         if product is None:
             raise HTTPException(status_code=404, detail="Product not found")
         return product
@@ -59,10 +79,9 @@ def read_product(product_id: int, session: Session = Depends(get_session)):
         raise e
 
 @app.put("/products/{product_id}", response_model=Product)
-async def update_product(product_id: int, product: Product, session: Session = Depends(get_session),
-                         producer = Depends(get_kafka_producer)):
+async def update_product(product_id: int, product: Product, session: AsyncSession = Depends(get_session)):
     try:
-        existing_product = session.exec(select(Product).filter(Product.id == product_id)).first()
+        existing_product = (await session.exec(select(Product).filter(Product.id == product_id))).first()
         if existing_product is None:
             raise HTTPException(status_code=404, detail="Product not found")
         
@@ -70,34 +89,37 @@ async def update_product(product_id: int, product: Product, session: Session = D
             setattr(existing_product, field, value)
         
         session.add(existing_product)
-        session.commit()
-        
         product_dict = {field: getattr(existing_product, field) for field in existing_product.dict()}
-        product_json = json.dumps(product_dict).encode("utf-8")
-        await producer.send_and_wait("inventory", product_json)
+        add_outbox_event(session, "inventory", "inventory", product_dict, key=str(product_id))
+        await session.commit()
         
-        session.refresh(existing_product)
+        await session.refresh(existing_product)
         return existing_product
     except HTTPException as e:
         raise e
 
 @app.delete("/products/{product_id}")
-def delete_product(product_id: int, session: Session = Depends(get_session),
-                   producer = Depends(get_kafka_producer)):
+async def delete_product(product_id: int, session: AsyncSession = Depends(get_session)):
     try:
-        product = session.exec(select(Product).filter(Product.id == product_id)).first()
+        product = (await session.exec(select(Product).filter(Product.id == product_id))).first()
         if product is None:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        session.delete(product)
-        session.commit()
-        
         product_dict = {field: getattr(product, field) for field in product.dict()}
-        product_json = json.dumps(product_dict).encode("utf-8")
-        producer.send_and_wait("inventory", product_json)
+        await session.delete(product)
+        add_outbox_event(session, "inventory", "inventory", product_dict, key=str(product_id))
+        await session.commit()
         
         return {"message": "Product deleted successfully"}
     except HTTPException as e:
         raise e
 
-
+@app.post("/inventory/adjust")
+async def adjust_inventory(batch: StockAdjustmentBatch, session: AsyncSession = Depends(get_session)):
+    try:
+        applied, result = await adjust_stock(session, batch)
+        if not applied:
+            raise HTTPException(status_code=409, detail=result)
+        return result
+    except HTTPException as e:
+        raise e
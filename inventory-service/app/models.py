@@ -1,13 +1,50 @@
 #models.py
 
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Index, LargeBinary, text
 from typing import Optional
+from datetime import datetime
 
 class Product(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    name: str
+    name: str = Field(index=True)
     description: str
-    price: float
+    price: float = Field(index=True)
     quantity: int
 
 
+class StockAdjustment(SQLModel):
+    product_id: int
+    delta: int
+
+
+class StockAdjustmentBatch(SQLModel):
+    adjustments: list[StockAdjustment] = Field(min_length=1)
+    # All-or-nothing: reject the whole batch if any product can't be adjusted.
+    atomic: bool = False
+
+
+class Reservation(SQLModel, table=True):
+    # Stock held for an order by the checkout saga: reserved, then committed
+    # or released. "rejected" and a release that came first ("released") are
+    # kept too, so a late or repeated command gets the same answer.
+    # The order's id, not a generated one.
+    order_id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    status: str
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class OutboxEvent(SQLModel, table=True):
+    # Events are written in the same transaction as the entity they describe
+    # and published to Kafka afterwards by the outbox relay.
+    __table_args__ = (
+        Index("ix_outboxevent_unpublished", "id",
+              postgresql_where=text("published_at IS NULL")),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    topic: str
+    key: Optional[str] = None
+    payload: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    published_at: Optional[datetime] = Field(default=None, index=True)
@@ -0,0 +1,107 @@
+#pagination.py
+import base64
+import binascii
+import hashlib
+import json
+from typing import Any
+
+from fastapi import HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import settings
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, _, value = raw.partition(":")
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class PageParams:
+    # Query parameters shared by every list endpoint. Validation happens here,
+    # in the dependency, so bad input is a 400 rather than a handler error.
+    def __init__(
+        self,
+        limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+        after: str | None = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+        fields: str | None = Query(None, description="Comma-separated list of fields to return"),
+    ) -> None:
+        self.limit = limit
+        self.after = decode_cursor(after) if after else None
+        self.fields = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+
+
+async def fetch_page(session: AsyncSession, model: type[SQLModel],
+                     page: PageParams) -> tuple[list[dict[str, Any]], str | None]:
+    # Keyset pagination on the primary key: each page is an index range scan no
+    # matter how deep it is, and rows are read as plain mappings instead of
+    # being built into ORM objects.
+    table = model.__table__
+    names = page.fields or list(table.columns.keys())
+    unknown = [name for name in names if name not in table.columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if "id" not in names:
+        names = ["id", *names]
+
+    statement = select(*(table.columns[name] for name in names)).order_by(table.c.id).limit(page.limit + 1)
+    if page.after is not None:
+        statement = statement.where(table.c.id > page.after)
+    rows = [dict(row) for row in (await session.exec(statement)).mappings()]
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor(rows[-1]["id"])
+    return rows, next_cursor
+
+
+def page_response(rows: list[dict[str, Any]], next_cursor: str | None) -> JSONResponse:
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    # jsonable_encoder turns datetimes and the like into JSON-safe values.
+    return JSONResponse(content=jsonable_encoder(rows), headers=headers)
+
+
+async def paginate(session: AsyncSession, model: type[SQLModel], page: PageParams) -> JSONResponse:
+    return page_response(*await fetch_page(session, model, page))
+
+
+def render_page(rows: list[dict[str, Any]], next_cursor: str | None) -> tuple[bytes, dict[str, str]]:
+    # Serialized the way JSONResponse does it; the ETag is a hash of the body,
+    # so it only changes when the page content does.
+    body = json.dumps(jsonable_encoder(rows), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    headers = {
+        "ETag": '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+        "Cache-Control": f"public, max-age={settings.LIST_CACHE_MAX_AGE_SECONDS}, must-revalidate",
+    }
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return body, headers
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison.
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def conditional_response(request: Request, body: bytes, headers: dict[str, str]) -> Response:
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
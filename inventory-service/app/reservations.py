@@ -0,0 +1,98 @@
+#reservations.py
+from datetime import datetime
+
+from aiokafka import ConsumerRecord
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.consumer import handles
+from app.db_engine import engine
+from app.events import EventDecodeError, decode_event
+from app.models import Reservation, StockAdjustment, StockAdjustmentBatch
+from app.outbox import add_outbox_event
+from app.stock import apply_adjustments
+from app import settings
+
+# Checkout saga participant. Each command is answered on the reply topic
+# through the outbox, in the same transaction as its effect, and the
+# reservation row makes every command safe to receive twice.
+
+
+def _batch(product_ids: list[int], quantities: list[int], sign: int, atomic: bool) -> StockAdjustmentBatch:
+    return StockAdjustmentBatch(
+        adjustments=[StockAdjustment(product_id=product_id, delta=sign * quantity)
+                     for product_id, quantity in zip(product_ids, quantities)],
+        atomic=atomic,
+    )
+
+
+async def _locked(session: AsyncSession, order_id: int) -> Reservation | None:
+    statement = select(Reservation).where(Reservation.order_id == order_id).with_for_update()
+    return (await session.exec(statement)).first()
+
+
+async def reserve(session: AsyncSession, command: dict) -> tuple[bool, str]:
+    claim = (insert(Reservation)
+             .values(order_id=command["order_id"], status="reserved", updated_at=datetime.utcnow())
+             .on_conflict_do_nothing()
+             .returning(Reservation.order_id))
+    if (await session.exec(claim)).first() is None:
+        # Seen before, or released before it got here.
+        existing = await session.get(Reservation, command["order_id"])
+        return existing.status in ("reserved", "committed"), f"reservation already {existing.status}"
+
+    applied, result = await apply_adjustments(
+        session, _batch(command["product_ids"], command["quantities"], -1, atomic=True))
+    if applied:
+        return True, ""
+    await session.rollback()
+    session.add(Reservation(order_id=command["order_id"], status="rejected"))
+    return False, "; ".join(f"{item['product_id']}: {item['reason']}" for item in result["rejected"])
+
+
+async def release(session: AsyncSession, command: dict) -> tuple[bool, str]:
+    reservation = await _locked(session, command["order_id"])
+    if reservation is None:
+        # Leave a marker so a reserve still on its way is turned away.
+        await session.exec(insert(Reservation)
+                           .values(order_id=command["order_id"], status="released", updated_at=datetime.utcnow())
+                           .on_conflict_do_nothing())
+        return True, ""
+    if reservation.status == "reserved":
+        await apply_adjustments(session, _batch(command["product_ids"], command["quantities"], 1, atomic=False))
+        reservation.status = "released"
+        reservation.updated_at = datetime.utcnow()
+        session.add(reservation)
+    return True, ""
+
+
+async def commit(session: AsyncSession, command: dict) -> tuple[bool, str]:
+    reservation = await _locked(session, command["order_id"])
+    if reservation is None or reservation.status not in ("reserved", "committed"):
+        return False, f"reservation {reservation.status if reservation else 'missing'}"
+    reservation.status = "committed"
+    reservation.updated_at = datetime.utcnow()
+    session.add(reservation)
+    return True, ""
+
+
+ACTIONS = {"reserve": reserve, "release": release, "commit": commit}
+
+
+@handles(settings.CHECKOUT_INVENTORY_TOPIC)
+async def handle_inventory_command(record: ConsumerRecord) -> None:
+    try:
+        event = decode_event(record.value)
+    except EventDecodeError:
+        return
+    if event.type != "checkout_command" or event.data["action"] not in ACTIONS:
+        return
+    command = event.data
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        ok, reason = await ACTIONS[command["action"]](session, command)
+        add_outbox_event(session, settings.CHECKOUT_REPLY_TOPIC, "checkout_reply", {
+            "order_id": command["order_id"], "action": command["action"], "ok": ok, "reason": reason,
+        }, key=str(command["order_id"]))
+        await session.commit()
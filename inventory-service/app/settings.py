@@ -15,5 +15,63 @@ BOOTSTRAP_SERVER = config("BOOTSTRAP_SERVER", cast=str)
 KAFKA_INVENTORY_TOPIC = config("KAFKA_INVENTORY_TOPIC", cast=str)
 KAFKA_CONSUMER_GROUP_ID_FOR_INVENTORY = config("KAFKA_CONSUMER_GROUP_ID_FOR_INVENTORY", cast=str)
 
+# Kafka producer tuning. Compression accepts gzip, snappy, lz4 or zstd (lz4 and
+# zstd need the matching aiokafka extra installed); leave empty to disable.
+KAFKA_PRODUCER_LINGER_MS = config("KAFKA_PRODUCER_LINGER_MS", cast=int, default=5)
+KAFKA_PRODUCER_MAX_BATCH_SIZE = config("KAFKA_PRODUCER_MAX_BATCH_SIZE", cast=int, default=65536)
+KAFKA_PRODUCER_COMPRESSION = config("KAFKA_PRODUCER_COMPRESSION", cast=str, default="")
+KAFKA_PRODUCER_ACKS = config("KAFKA_PRODUCER_ACKS", cast=str, default="all")
 
+# Transactional outbox relay
+OUTBOX_RELAY_BATCH_SIZE = config("OUTBOX_RELAY_BATCH_SIZE", cast=int, default=500)
+OUTBOX_RELAY_INTERVAL_SECONDS = config("OUTBOX_RELAY_INTERVAL_SECONDS", cast=float, default=0.5)
+OUTBOX_RETENTION_HOURS = config("OUTBOX_RETENTION_HOURS", cast=int, default=24)
+OUTBOX_PURGE_INTERVAL_SECONDS = config("OUTBOX_PURGE_INTERVAL_SECONDS", cast=float, default=300)
+# Advisory lock held by the relay publishing a batch. Every relay sharing the
+# outbox table must use the same id: one publishes at a time so that events
+# keep their id order per key, and the others wait for the next pass.
+OUTBOX_RELAY_LOCK_ID = config("OUTBOX_RELAY_LOCK_ID", cast=int, default=7301001)
 
+# Kafka consumer runner
+KAFKA_CONSUMER_MAX_RECORDS = config("KAFKA_CONSUMER_MAX_RECORDS", cast=int, default=500)
+KAFKA_CONSUMER_WORKERS = config("KAFKA_CONSUMER_WORKERS", cast=int, default=16)
+KAFKA_CONSUMER_MAX_IN_FLIGHT = config("KAFKA_CONSUMER_MAX_IN_FLIGHT", cast=int, default=5000)
+KAFKA_CONSUMER_MAX_RETRIES = config("KAFKA_CONSUMER_MAX_RETRIES", cast=int, default=3)
+KAFKA_CONSUMER_STATS_INTERVAL_SECONDS = config("KAFKA_CONSUMER_STATS_INTERVAL_SECONDS", cast=float, default=60)
+# How long a rebalance waits for batches in flight to finish so their offsets
+# can be committed before the partitions are handed over.
+KAFKA_CONSUMER_REVOKE_TIMEOUT_SECONDS = config("KAFKA_CONSUMER_REVOKE_TIMEOUT_SECONDS", cast=float, default=30)
+
+# Wire format for published events: "binary" (compact, schema-versioned) or
+# "json". Consumers detect the format per message, so either can be rolled out.
+EVENT_ENCODING = config("EVENT_ENCODING", cast=str, default="binary")
+
+# Database connection pool. Each replica can hold up to DB_POOL_SIZE +
+# DB_MAX_OVERFLOW connections, so keep replicas * (size + overflow) for every
+# service below Postgres max_connections.
+DB_POOL_SIZE = config("DB_POOL_SIZE", cast=int, default=5)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", cast=int, default=10)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", cast=float, default=30)
+DB_POOL_RECYCLE = config("DB_POOL_RECYCLE", cast=int, default=300)
+DB_POOL_PRE_PING = config("DB_POOL_PRE_PING", cast=bool, default=True)
+DB_STATEMENT_TIMEOUT_MS = config("DB_STATEMENT_TIMEOUT_MS", cast=int, default=0)
+
+# List endpoints
+DEFAULT_PAGE_SIZE = config("DEFAULT_PAGE_SIZE", cast=int, default=50)
+MAX_PAGE_SIZE = config("MAX_PAGE_SIZE", cast=int, default=500)
+# How long clients may reuse a listing before revalidating it with
+# If-None-Match; 0 makes them revalidate on every poll.
+LIST_CACHE_MAX_AGE_SECONDS = config("LIST_CACHE_MAX_AGE_SECONDS", cast=int, default=0)
+
+# Optional read replica for read-only routes; leave empty to keep every query on
+# the primary. After a write, that client reads from the primary for
+# DB_REPLICA_STICKY_SECONDS, and a replica that fails a connection check is
+# skipped for DB_REPLICA_RETRY_SECONDS.
+DATABASE_REPLICA_URL = config("DATABASE_REPLICA_URL", cast=Secret, default="")
+DB_REPLICA_STICKY_SECONDS = config("DB_REPLICA_STICKY_SECONDS", cast=float, default=5)
+DB_REPLICA_RETRY_SECONDS = config("DB_REPLICA_RETRY_SECONDS", cast=float, default=30)
+
+# Checkout saga: reserve / release / commit commands from order-service, and
+# where the replies go.
+CHECKOUT_INVENTORY_TOPIC = config("CHECKOUT_INVENTORY_TOPIC", cast=str, default="inventory-commands")
+CHECKOUT_REPLY_TOPIC = config("CHECKOUT_REPLY_TOPIC", cast=str, default="checkout-replies")
@@ -0,0 +1,74 @@
+#stock.py
+from collections import defaultdict
+from typing import Any
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.types import Integer
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Product, StockAdjustmentBatch
+from app.outbox import add_outbox_event
+
+# Locks the rows in id order first, so concurrent batches touching the same
+# SKUs queue up instead of deadlocking, then applies every delta in a single
+# statement. The quantity guard makes an adjustment that would go negative
+# simply not match.
+_ADJUST = text(f"""
+    WITH locked AS (
+        SELECT id FROM {Product.__tablename__}
+        WHERE id = ANY(:ids) ORDER BY id FOR UPDATE
+    ), deltas AS (
+        SELECT * FROM unnest(:ids, :deltas) AS d(id, delta)
+    )
+    UPDATE {Product.__tablename__} AS p
+    SET quantity = p.quantity + deltas.delta
+    FROM locked JOIN deltas ON deltas.id = locked.id
+    WHERE p.id = locked.id AND p.quantity + deltas.delta >= 0
+    RETURNING p.*
+""").bindparams(
+    bindparam("ids", type_=ARRAY(Integer)),
+    bindparam("deltas", type_=ARRAY(Integer)),
+)
+
+_EXISTING = text(f"SELECT id FROM {Product.__tablename__} WHERE id = ANY(:ids)").bindparams(
+    bindparam("ids", type_=ARRAY(Integer)),
+)
+
+
+async def apply_adjustments(session: AsyncSession, batch: StockAdjustmentBatch) -> tuple[bool, dict[str, Any]]:
+    # Like adjust_stock but leaves the transaction to the caller, which has to
+    # roll back when an atomic batch comes back rejected.
+    # Several adjustments to one product are netted into a single delta.
+    deltas: dict[int, int] = defaultdict(int)
+    for adjustment in batch.adjustments:
+        deltas[adjustment.product_id] += adjustment.delta
+    ids = sorted(deltas)
+
+    result = await session.exec(_ADJUST, params={"ids": ids, "deltas": [deltas[i] for i in ids]})
+    updated = {row["id"]: dict(row) for row in result.mappings()}
+
+    rejected = []
+    missing = [product_id for product_id in ids if product_id not in updated]
+    if missing:
+        found = set((await session.exec(_EXISTING, params={"ids": missing})).scalars())
+        rejected = [{"product_id": product_id,
+                     "reason": "insufficient stock" if product_id in found else "product not found"}
+                    for product_id in missing]
+
+    if rejected and batch.atomic:
+        return False, {"applied": [], "rejected": rejected}
+
+    for product_id, row in updated.items():
+        add_outbox_event(session, "inventory", "inventory", row, key=str(product_id))
+    applied = [{"product_id": product_id, "quantity": row["quantity"]} for product_id, row in updated.items()]
+    return True, {"applied": applied, "rejected": rejected}
+
+
+async def adjust_stock(session: AsyncSession, batch: StockAdjustmentBatch) -> tuple[bool, dict[str, Any]]:
+    applied, result = await apply_adjustments(session, batch)
+    if applied:
+        await session.commit()
+    else:
+        await session.rollback()
+    return applied, result
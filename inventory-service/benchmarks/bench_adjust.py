@@ -0,0 +1,95 @@
+#bench_adjust.py
+#
+# Hot-SKU contention: many clients decrement the same few products at once.
+# Compares POST /inventory/adjust with the read-modify-write PUT /products/{id}
+# path and checks how much stock each one loses, on a running inventory service.
+#
+#   poetry run python -m benchmarks.bench_adjust --url http://localhost:8084 --skus 1 --concurrency 64
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+
+async def create_skus(client: httpx.AsyncClient, skus: int, stock: int) -> list[int]:
+    ids = []
+    for i in range(skus):
+        response = await client.post("/products/", json={"name": f"hot-{i}", "description": "contention benchmark",
+                                                         "price": 1.0, "quantity": stock})
+        response.raise_for_status()
+        ids.append(response.json()["id"])
+    return ids
+
+
+async def read_quantities(client: httpx.AsyncClient, ids: list[int]) -> int:
+    total = 0
+    for product_id in ids:
+        total += (await client.get(f"/products/{product_id}")).json()["quantity"]
+    return total
+
+
+async def adjust(client: httpx.AsyncClient, ids: list[int], batch: int) -> bool:
+    adjustments = [{"product_id": random.choice(ids), "delta": -1} for _ in range(batch)]
+    response = await client.post("/inventory/adjust", json={"adjustments": adjustments, "atomic": True})
+    return response.status_code == 200
+
+
+async def read_modify_write(client: httpx.AsyncClient, ids: list[int], batch: int) -> bool:
+    for _ in range(batch):
+        product_id = random.choice(ids)
+        product = (await client.get(f"/products/{product_id}")).json()
+        product["quantity"] -= 1
+        if (await client.put(f"/products/{product_id}", json=product)).status_code != 200:
+            return False
+    return True
+
+
+async def contend(client: httpx.AsyncClient, ids: list[int], args: argparse.Namespace, operation) -> None:
+    latencies: list[float] = []
+    succeeded = 0
+
+    async def worker() -> None:
+        nonlocal succeeded
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            if await operation(client, ids, args.batch):
+                succeeded += 1
+            latencies.append(time.perf_counter() - start)
+
+    before = await read_quantities(client, ids)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    after = await read_quantities(client, ids)
+
+    expected = before - succeeded * args.batch
+    latencies.sort()
+    print(f"{operation.__name__}: {len(latencies) / elapsed:.1f} req/s "
+          f"p50={statistics.median(latencies) * 1000:.2f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f}ms "
+          f"lost_updates={after - expected}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        stock = args.concurrency * args.requests * args.batch
+        await contend(client, await create_skus(client, args.skus, stock), args, adjust)
+        await contend(client, await create_skus(client, args.skus, stock), args, read_modify_write)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stock adjustment under hot-SKU contention")
+    parser.add_argument("--url", default="http://localhost:8084")
+    parser.add_argument("--skus", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=1, help="adjustments per request")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
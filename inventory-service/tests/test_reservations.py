@@ -0,0 +1,85 @@
+import asyncio
+
+from app import reservations
+from app.models import Reservation
+
+COMMAND = {"order_id": 1, "product_ids": [7], "quantities": [3]}
+
+
+class FakeResult:
+    def __init__(self, row) -> None:
+        self.row = row
+
+    def first(self):
+        return self.row
+
+
+class FakeSession:
+    # A single reservation row, as Postgres would hold it for order 1.
+    def __init__(self) -> None:
+        self.reservation: Reservation | None = None
+
+    async def exec(self, statement) -> FakeResult:
+        if statement.is_insert:
+            if self.reservation is not None:
+                return FakeResult(None)  # ON CONFLICT DO NOTHING
+            values = statement.compile().params
+            self.reservation = Reservation(order_id=values["order_id"], status=values["status"])
+            return FakeResult((values["order_id"],))
+        return FakeResult(self.reservation)
+
+    async def get(self, model, key):
+        return self.reservation
+
+    def add(self, obj) -> None:
+        self.reservation = obj
+
+    async def rollback(self) -> None:
+        self.reservation = None
+
+
+def run(session: FakeSession, action: str) -> tuple[bool, str]:
+    return asyncio.run(reservations.ACTIONS[action](session, COMMAND))
+
+
+def adjustments(monkeypatch, applied: bool = True) -> list[int]:
+    deltas = []
+
+    async def apply(session, batch):
+        deltas.extend(adjustment.delta for adjustment in batch.adjustments)
+        return applied, {"rejected": [] if applied else [{"product_id": 7, "reason": "insufficient stock"}]}
+
+    monkeypatch.setattr(reservations, "apply_adjustments", apply)
+    return deltas
+
+
+def test_redelivered_commands_apply_once(monkeypatch)->None:
+    deltas = adjustments(monkeypatch)
+    session = FakeSession()
+    assert run(session, "reserve")[0] and run(session, "reserve")[0]
+    assert deltas == [-3]
+    assert run(session, "commit")[0] and run(session, "commit")[0]
+    assert session.reservation.status == "committed"
+
+    session = FakeSession()
+    run(session, "reserve")
+    assert run(session, "release")[0] and run(session, "release")[0]
+    assert deltas == [-3, -3, 3]
+    assert session.reservation.status == "released"
+
+
+def test_release_before_reserve_turns_it_away(monkeypatch)->None:
+    deltas = adjustments(monkeypatch)
+    session = FakeSession()
+    assert run(session, "release")[0]
+    assert run(session, "reserve") == (False, "reservation already released")
+    assert deltas == []
+
+
+def test_rejected_reserve_stays_rejected(monkeypatch)->None:
+    deltas = adjustments(monkeypatch, applied=False)
+    session = FakeSession()
+    assert not run(session, "reserve")[0]
+    assert not run(session, "reserve")[0]
+    assert deltas == [-3]
+    assert run(session, "commit") == (False, "reservation rejected")
@@ -2,7 +2,8 @@
 
 # kafka.py
 
-from aiokafka import AIOKafkaProducer, AIOKafkaConsumer
+from aiokafka import AIOKafkaProducer
+from app.consumer import ConsumerRunner
 
 
 async def get_kafka_producer():
@@ -15,17 +16,7 @@ async def get_kafka_producer():
 
 
 async def consume_messages(topic, bootstrap_servers):
-    consumer = AIOKafkaConsumer(
-        topic,
-        bootstrap_servers=bootstrap_servers,
-        group_id="notification-group",
-        auto_offset_reset='earliest'
-    )
-
-    await consumer.start()
-    try:
-        async for message in consumer:
-            print(f"Received message: {message.value.decode()} on topic {message.topic}")
-            # Add processing logic for notifications
-    finally:
-        await consumer.stop()
+    # Records are handed to the handlers registered for the topic in
+    # app.consumer; see ConsumerRunner for batching, ordering and commits.
+    runner = ConsumerRunner(topic, bootstrap_servers=bootstrap_servers, group_id="notification-group")
+    await runner.run()
@@ -1,49 +1,55 @@
 from typing import Annotated
-from sqlmodel import Session, select
+import asyncio
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import FastAPI, Depends, HTTPException, Request
 
 from app.models import EmailNotification, SMSNotification
-from app.db_engine import create_db_and_tables, get_session
+from app.db_engine import get_pool_stats, get_read_session, get_session
+from app.auth import require_token
+from app.pagination import PageParams, paginate
 from app.smtp import send_email
 from app.sms import send_sms
 
 app = FastAPI(title="Notification Service", version="0.0.2", description="The Notification Service API sends notifications (email and SMS) to users about order statuses and other important updates. It provides endpoints for creating and sending notifications, ensuring timely and effective communication with users. This service integrates with other services to deliver relevant updates and maintain user engagement.")
 
 
-@app.on_event("startup")
-def on_startup():
-    print("Creating tables..")
-    create_db_and_tables()
-
-
 @app.get("/")
 def read_root():
     return {"Hello": "Notification Service"}
 
+@app.get("/db/pool")
+def read_pool_stats():
+    return get_pool_stats()
+
 # Endpoints for Email Notifications
 
 
-@app.post("/notifications/", response_model=EmailNotification)
+@app.post("/notifications/", response_model=EmailNotification, dependencies=[Depends(require_token)])
 async def create_new_email_notification(
     notification: EmailNotification,
-    session: Annotated[Session, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(get_session)]
 ) -> EmailNotification:
     try:
-        send_email(notification.recipient_email,
-                   notification.subject, notification.message)
+        # smtplib and the Twilio client are blocking, keep them off the event loop.
+        await asyncio.to_thread(send_email, notification.recipient_email,
+                                notification.subject, notification.message)
         session.add(notification)
-        session.commit()
-        session.refresh(notification)
+        await session.commit()
+        await session.refresh(notification)
         return notification
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/notifications/", response_model=list[EmailNotification])
-def read_notifications(session: Annotated[Session, Depends(get_session)]):
+@app.get("/notifications/", response_model=list[EmailNotification], dependencies=[Depends(require_token)])
+async def read_notifications(
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+    page: Annotated[PageParams, Depends()]
+):
     try:
-        notifications = session.exec(select(EmailNotification)).all()
-        return notifications
+        return await paginate(session, EmailNotification, page)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -60,16 +66,16 @@ def read_notifications(session: Annotated[Session, Depends(get_session)]):
 #         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.delete("/notifications/{notification_id}")
-def delete_notification(notification_id: int, session: Annotated[Session, Depends(get_session)]):
+@app.delete("/notifications/{notification_id}", dependencies=[Depends(require_token)])
+async def delete_notification(notification_id: int, session: Annotated[AsyncSession, Depends(get_session)]):
     try:
-        notification = session.get(EmailNotification, notification_id)
+        notification = await session.get(EmailNotification, notification_id)
         if not notification:
             raise HTTPException(
                 status_code=404, detail="Notification not found")
 
-        session.delete(notification)
-        session.commit()
+        await session.delete(notification)
+        await session.commit()
         return {"detail": "Notification deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -77,26 +83,30 @@ def delete_notification(notification_id: int, session: Annotated[Session, Depend
 # Endpoints for SMS Notifications
 
 
-@app.post("/sms/", response_model=SMSNotification)
+@app.post("/sms/", response_model=SMSNotification, dependencies=[Depends(require_token)])
 async def create_new_sms_notification(
     notification: SMSNotification,
-    session: Annotated[Session, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(get_session)]
 ) -> SMSNotification:
     try:
-        send_sms(notification.phone_number, notification.message)
+        await asyncio.to_thread(send_sms, notification.phone_number, notification.message)
         session.add(notification)
-        session.commit()
-        session.refresh(notification)
+        await session.commit()
+        await session.refresh(notification)
         return notification
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/sms/", response_model=list[SMSNotification])
-def read_sms_notifications(session: Annotated[Session, Depends(get_session)]):
+@app.get("/sms/", response_model=list[SMSNotification], dependencies=[Depends(require_token)])
+async def read_sms_notifications(
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+    page: Annotated[PageParams, Depends()]
+):
     try:
-        notifications = session.exec(select(SMSNotification)).all()
-        return notifications
+        return await paginate(session, SMSNotification, page)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -113,16 +123,16 @@ def read_sms_notifications(session: Annotated[Session, Depends(get_session)]):
 #         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.delete("/sms/{notification_id}")
-def delete_sms_notification(notification_id: int, session: Annotated[Session, Depends(get_session)]):
+@app.delete("/sms/{notification_id}", dependencies=[Depends(require_token)])
+async def delete_sms_notification(notification_id: int, session: Annotated[AsyncSession, Depends(get_session)]):
     try:
-        notification = session.get(SMSNotification, notification_id)
+        notification = await session.get(SMSNotification, notification_id)
         if not notification:
             raise HTTPException(
                 status_code=404, detail="SMS Notification not found")
 
-        session.delete(notification)
-        session.commit()
+        await session.delete(notification)
+        await session.commit()
         return {"detail": "SMS Notification deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -19,3 +19,48 @@ FROM_EMAIL = config("FROM_EMAIL", cast=str)
 TWILIO_ACCOUNT_SID = config("TWILIO_ACCOUNT_SID", cast=str)
 TWILIO_AUTH_TOKEN = config("TWILIO_AUTH_TOKEN", cast=str)
 TWILIO_PHONE_NUMBER = config("TWILIO_PHONE_NUMBER", cast=str)
+
+# Kafka consumer runner
+KAFKA_CONSUMER_MAX_RECORDS = config("KAFKA_CONSUMER_MAX_RECORDS", cast=int, default=500)
+KAFKA_CONSUMER_WORKERS = config("KAFKA_CONSUMER_WORKERS", cast=int, default=16)
+KAFKA_CONSUMER_MAX_IN_FLIGHT = config("KAFKA_CONSUMER_MAX_IN_FLIGHT", cast=int, default=5000)
+KAFKA_CONSUMER_MAX_RETRIES = config("KAFKA_CONSUMER_MAX_RETRIES", cast=int, default=3)
+KAFKA_CONSUMER_STATS_INTERVAL_SECONDS = config("KAFKA_CONSUMER_STATS_INTERVAL_SECONDS", cast=float, default=60)
+# How long a rebalance waits for batches in flight to finish so their offsets
+# can be committed before the partitions are handed over.
+KAFKA_CONSUMER_REVOKE_TIMEOUT_SECONDS = config("KAFKA_CONSUMER_REVOKE_TIMEOUT_SECONDS", cast=float, default=30)
+
+# Wire format for published events: "binary" (compact, schema-versioned) or
+# "json". Consumers detect the format per message, so either can be rolled out.
+EVENT_ENCODING = config("EVENT_ENCODING", cast=str, default="binary")
+
+# Database connection pool. Each replica can hold up to DB_POOL_SIZE +
+# DB_MAX_OVERFLOW connections, so keep replicas * (size + overflow) for every
+# service below Postgres max_connections.
+DB_POOL_SIZE = config("DB_POOL_SIZE", cast=int, default=5)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", cast=int, default=10)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", cast=float, default=30)
+DB_POOL_RECYCLE = config("DB_POOL_RECYCLE", cast=int, default=300)
+DB_POOL_PRE_PING = config("DB_POOL_PRE_PING", cast=bool, default=True)
+DB_STATEMENT_TIMEOUT_MS = config("DB_STATEMENT_TIMEOUT_MS", cast=int, default=0)
+
+# List endpoints
+DEFAULT_PAGE_SIZE = config("DEFAULT_PAGE_SIZE", cast=int, default=50)
+MAX_PAGE_SIZE = config("MAX_PAGE_SIZE", cast=int, default=500)
+
+# Optional read replica for read-only routes; leave empty to keep every query on
+# the primary. After a write, that client reads from the primary for
+# DB_REPLICA_STICKY_SECONDS, and a replica that fails a connection check is
+# skipped for DB_REPLICA_RETRY_SECONDS.
+DATABASE_REPLICA_URL = config("DATABASE_REPLICA_URL", cast=Secret, default="")
+DB_REPLICA_STICKY_SECONDS = config("DB_REPLICA_STICKY_SECONDS", cast=float, default=5)
+DB_REPLICA_RETRY_SECONDS = config("DB_REPLICA_RETRY_SECONDS", cast=float, default=30)
+
+# Access tokens from user-service are verified locally against its JWKS.
+# Set AUTH_REQUIRED once callers send tokens.
+AUTH_REQUIRED = config("AUTH_REQUIRED", cast=bool, default=False)
+USER_SERVICE_JWKS_URL = config("USER_SERVICE_JWKS_URL", cast=str, default="http://user-service:8081/.well-known/jwks.json")
+USER_SERVICE_TOKEN_URL = config("USER_SERVICE_TOKEN_URL", cast=str, default="http://localhost:8081/token")
+JWKS_CACHE_SECONDS = config("JWKS_CACHE_SECONDS", cast=float, default=300)
+JWKS_MIN_REFRESH_SECONDS = config("JWKS_MIN_REFRESH_SECONDS", cast=float, default=10)
+JWKS_FETCH_TIMEOUT_SECONDS = config("JWKS_FETCH_TIMEOUT_SECONDS", cast=float, default=2)
@@ -0,0 +1,37 @@
+"""index hot-path lookups
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, column)
+INDEXES = (
+    ('ix_order_user_id', 'order', 'user_id'),
+)
+
+
+def upgrade() -> None:
+    # Build the indexes CONCURRENTLY so writes to live tables aren't blocked;
+    # that can't run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        for name, table, column in INDEXES:
+            op.create_index(name, table, [column], postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,40 @@
+"""order status
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Orders placed before the checkout saga are done, so they are backfilled
+    # as confirmed; new rows start out pending.
+    op.add_column("order", sa.Column("status", sqlmodel.sql.sqltypes.AutoString(), nullable=False,
+                                     server_default="confirmed"))
+    op.alter_column("order", "status", server_default="pending")
+    op.add_column("order", sa.Column("status_updated_at", sa.DateTime(), nullable=False,
+                                     server_default=sa.text("(now() at time zone 'utc')")))
+    # The timeout sweep only ever looks at checkouts still in flight.
+    with op.get_context().autocommit_block():
+        op.create_index("ix_order_open_checkouts", "order", ["status_updated_at"],
+                        postgresql_where=sa.text("status IN ('pending', 'reserved')"),
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_order_open_checkouts", table_name="order", postgresql_concurrently=True, if_exists=True)
+    op.drop_column("order", "status_updated_at")
+    op.drop_column("order", "status")
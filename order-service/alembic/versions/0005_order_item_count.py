@@ -0,0 +1,36 @@
+"""order item count
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # products held a product reference until orders got lines, and the item
+    # count after that. Orders with lines move their count to item_count;
+    # older orders keep their product reference in products.
+    op.add_column("order", sa.Column("item_count", sa.Integer(), nullable=True))
+    op.alter_column("order", "products", existing_type=sa.Integer(), nullable=True)
+    op.execute("""
+        UPDATE "order" o SET item_count = l.items, products = NULL
+        FROM (SELECT order_id, SUM(quantity) AS items FROM orderline GROUP BY order_id) l
+        WHERE l.order_id = o.id
+    """)
+
+
+def downgrade() -> None:
+    op.execute('UPDATE "order" SET products = item_count WHERE products IS NULL')
+    op.alter_column("order", "products", existing_type=sa.Integer(), nullable=False)
+    op.drop_column("order", "item_count")
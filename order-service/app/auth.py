@@ -0,0 +1,84 @@
+#auth.py
+import asyncio
+import time
+
+import httpx
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+
+from app import settings
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl=settings.USER_SERVICE_TOKEN_URL, auto_error=False)
+
+
+class JWKSCache:
+    # user-service's public keys, fetched from its JWKS endpoint and kept for
+    # JWKS_CACHE_SECONDS. A token signed with a key we don't know yet (after a
+    # rotation) triggers an early refetch, at most every JWKS_MIN_REFRESH_SECONDS.
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.keys: dict[str, dict] = {}
+        self.fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _refresh(self) -> None:
+        async with httpx.AsyncClient(timeout=settings.JWKS_FETCH_TIMEOUT_SECONDS) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+        self.keys = {key["kid"]: key for key in response.json()["keys"]}
+        self.fetched_at = time.monotonic()
+
+    async def get_key(self, kid: str | None) -> dict | None:
+        age = time.monotonic() - self.fetched_at
+        if kid in self.keys and age < settings.JWKS_CACHE_SECONDS:
+            return self.keys[kid]
+        if age >= settings.JWKS_MIN_REFRESH_SECONDS:
+            async with self._lock:
+                # Another request may have refreshed while we waited.
+                if time.monotonic() - self.fetched_at >= settings.JWKS_MIN_REFRESH_SECONDS:
+                    try:
+                        await self._refresh()
+                    except (httpx.HTTPError, KeyError, ValueError) as e:
+                        # Keep verifying with the keys we have.
+                        print(f"Fetching JWKS from {self.url} failed: {e}")
+        return self.keys.get(kid)
+
+
+jwks = JWKSCache(settings.USER_SERVICE_JWKS_URL)
+
+
+async def get_token_claims(token: str | None = Depends(oauth2_scheme)) -> dict:
+    # Verifies a user-service access token locally, without calling user-service.
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    if token is None:
+        raise credentials_exception
+    try:
+        key = await jwks.get_key(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise credentials_exception
+        claims = jwt.decode(token, key, algorithms=[key.get("alg", "RS256")])
+    except JWTError:
+        raise credentials_exception
+    if claims.get("sub") is None:
+        raise credentials_exception
+    return claims
+
+
+async def require_token(token: str | None = Depends(oauth2_scheme)) -> None:
+    # Guards the resource routes. It only enforces once AUTH_REQUIRED is set,
+    # so callers can start sending tokens before it is switched on.
+    if settings.AUTH_REQUIRED:
+        await get_token_claims(token)
+
+
+async def require_stream_token(token: str | None = Depends(oauth2_scheme),
+                               query_token: str | None = Query(default=None, alias="token")) -> None:
+    # Like require_token, but browsers' EventSource can't set headers, so the
+    # token may also come as ?token=, the same as on the WebSocket route.
+    if settings.AUTH_REQUIRED:
+        await get_token_claims(token or query_token)
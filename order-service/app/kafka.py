@@ -1,34 +1,78 @@
 # kafka.py
-from aiokafka import AIOKafkaProducer, AIOKafkaConsumer
+from typing import Any, Callable
 
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
+from app import settings
+from app.consumer import ConsumerRunner
+from app.events import EventDecodeError, decode_event
 
-async def get_kafka_producer():
-    producer = AIOKafkaProducer(bootstrap_servers='broker:19092')
-    await producer.start()
+
+# One producer per process, started in the lifespan hook and shared by every
+# request, so handlers don't each pay for a broker connection and metadata fetch.
+_producer: AIOKafkaProducer | None = None
+
+
+def _parse_acks(value: str) -> int | str:
+    return value if value == "all" else int(value)
+
+
+def create_kafka_producer() -> AIOKafkaProducer:
+    return AIOKafkaProducer(
+        bootstrap_servers=settings.BOOTSTRAP_SERVER,
+        linger_ms=settings.KAFKA_PRODUCER_LINGER_MS,
+        max_batch_size=settings.KAFKA_PRODUCER_MAX_BATCH_SIZE,
+        compression_type=settings.KAFKA_PRODUCER_COMPRESSION or None,
+        acks=_parse_acks(settings.KAFKA_PRODUCER_ACKS),
+    )
+
+
+async def start_kafka_producer() -> AIOKafkaProducer:
+    global _producer
+    _producer = create_kafka_producer()
+    await _producer.start()
+    return _producer
+
+
+async def stop_kafka_producer() -> None:
+    global _producer
+    if _producer is None:
+        return
     try:
-        yield producer
+        # Push out anything still lingering in the batch buffers.
+        await _producer.flush()
     finally:
-        await producer.stop()
+        await _producer.stop()
+        _producer = None
+
+
+async def get_kafka_producer() -> AIOKafkaProducer:
+    if _producer is None:
+        raise RuntimeError("Kafka producer is not running")
+    return _producer
 
 
 async def consume_messages(topic, bootstrap_servers):
-    # Create a consumer instance.
-    consumer = AIOKafkaConsumer(
-        topic,
-        bootstrap_servers=bootstrap_servers,
-        group_id="my-group",
-        auto_offset_reset='earliest'
-    )
+    # Records are handed to the handlers registered for the topic in
+    # app.consumer; see ConsumerRunner for batching, ordering and commits.
+    runner = ConsumerRunner(topic, bootstrap_servers=bootstrap_servers, group_id="my-group")
+    await runner.run()
+
 
-    # Start the consumer.
+async def consume_order_status(topic: str, bootstrap_servers: str,
+                               publish: Callable[[dict[str, Any]], None]) -> None:
+    # Clients watching an order can be connected to any replica, so every
+    # replica needs every status change: this consumer joins no group, reads
+    # all partitions from the latest offset and commits nothing.
+    consumer = AIOKafkaConsumer(topic, bootstrap_servers=bootstrap_servers,
+                                group_id=None, auto_offset_reset="latest")
     await consumer.start()
     try:
-        # Continuously listen for messages.
-        async for message in consumer:
-            print(f"Received message: {
-                  message.value.decode()} on topic {message.topic}")
-            # Here you can add code to process each message.
-            # Example: parse the message, store it in a database, etc.
+        async for record in consumer:
+            try:
+                event = decode_event(record.value)
+            except EventDecodeError:
+                continue
+            if event.type == "order_status":
+                publish(event.data)
     finally:
-        # Ensure to close the consumer when done.
         await consumer.stop()
@@ -1,26 +1,43 @@
-from contextlib import asynccontextmanager
+from contextlib import aclosing, asynccontextmanager
 from typing import Annotated
-from sqlmodel import Session, select
-from fastapi import FastAPI, Depends, HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi import FastAPI, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from typing import AsyncGenerator
-from aiokafka import AIOKafkaProducer
 import asyncio
 import json
+from datetime import datetime
+import zlib
 
-from app.models import Order
-from app.db_engine import create_db_and_tables, get_session
-from app.kafka import consume_messages, get_kafka_producer
+from app.models import Order, OrderCreate, OrderLine, OrderUpdate, OrderWithLines
+from app.db_engine import engine, get_pool_stats, get_read_session, get_session
+from app.kafka import consume_messages, consume_order_status, start_kafka_producer, stop_kafka_producer
+from app.orders import create_order
+from app.outbox import relay_stats, run_outbox_relay
+from app.pagination import PageParams, paginate
+from app.saga import expire_checkouts_periodically, saga_stats
+from app.stream import Subscription, status_hub
+from app.auth import get_token_claims, require_stream_token, require_token
 from app import settings
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    print("Creating tables..")
-    create_db_and_tables()
+    producer = await start_kafka_producer()
+    relay = asyncio.create_task(run_outbox_relay(producer))
     task = asyncio.create_task(consume_messages(
         'order', settings.BOOTSTRAP_SERVER))
+    replies = asyncio.create_task(consume_messages(settings.CHECKOUT_REPLY_TOPIC, settings.BOOTSTRAP_SERVER))
+    sweep = asyncio.create_task(expire_checkouts_periodically())
+    statuses = asyncio.create_task(consume_order_status('orders', settings.BOOTSTRAP_SERVER, status_hub.publish))
     yield
+    statuses.cancel()
     task.cancel()
+    replies.cancel()
+    sweep.cancel()
+    relay.cancel()
+    await stop_kafka_producer()
 
 app = FastAPI(lifespan=lifespan, title="Order Service", version="0.0.1", description="The Order Service API is responsible for handling order creation, updating, and tracking. It provides endpoints for placing new orders, updating order details, and tracking order statuses throughout their lifecycle. This service manages the order process and integrates with other services to ensure accurate and up-to-date order information.")
 
@@ -30,38 +47,123 @@ def read_root():
     return {"Hello": "Order Service"}
 
 
-@app.post("/orders/", response_model=Order)
+@app.get("/db/pool")
+def read_pool_stats():
+    return get_pool_stats()
+
+
+@app.get("/outbox/stats")
+def read_outbox_stats():
+    return relay_stats
+
+
+@app.get("/checkout/stats")
+def read_checkout_stats():
+    return saga_stats
+
+
+@app.get("/orders/streams")
+def read_stream_stats():
+    return status_hub.stats()
+
+
+@app.post("/orders/", response_model=OrderWithLines, status_code=202, dependencies=[Depends(require_token)])
 async def create_new_order(
-    order: Order,
-    session: Annotated[Session, Depends(get_session)],
-    producer: Annotated[AIOKafkaProducer, Depends(get_kafka_producer)]
-) -> Order:
+    order: OrderCreate,
+    session: Annotated[AsyncSession, Depends(get_session)]
+):
+    # Prices come from the product table and the total is summed in the
+    # database, all in one round trip. The order is returned pending while
+    # stock and payment are taken care of by the checkout saga.
     try:
-        order_dict = {field: getattr(order, field)
-                        for field in order.dict()}
-        order_json = json.dumps(order_dict).encode("utf-8")
-        await producer.send_and_wait("orders", order_json)
-        session.add(order)
-        session.commit()
-        session.refresh(order)
-        return order
+        created, missing = await create_order(session, order)
+        if created is None:
+            raise HTTPException(status_code=404, detail={"message": "Products not found", "product_ids": missing})
+        return created
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/orders/", response_model=list[Order])
-def read_orders(session: Annotated[Session, Depends(get_session)]):
+@app.get("/orders/", response_model=list[Order], dependencies=[Depends(require_token)])
+async def read_orders(
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+    page: Annotated[PageParams, Depends()]
+):
     try:
-        orders = session.exec(select(Order)).all()
-        return orders
+        return await paginate(session, Order, page)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/orders/{order_id}", response_model=Order)
-def read_order_by_id(order_id: int, session: Annotated[Session, Depends(get_session)]):
+def _json_default(value):
+    # Datetimes go out as ISO 8601, the same as in the JSON responses.
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def export_line(row) -> str:
+    return json.dumps(dict(row), separators=(",", ":"), default=_json_default) + "\n"
+
+
+async def stream_orders(after_id: int | None, compress: bool) -> AsyncGenerator[bytes, None]:
+    # A server-side cursor fetches yield_per rows at a time, so memory stays
+    # flat no matter how large the table is.
+    statement = select(Order.__table__).order_by(Order.id)
+    if after_id is not None:
+        statement = statement.where(Order.id > after_id)
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    async with engine.connect() as conn:
+        result = await conn.stream(statement.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        async for rows in result.mappings().partitions():
+            chunk = "".join(export_line(row) for row in rows).encode("utf-8")
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    # Honours q-values: "gzip;q=0" refuses gzip, and "*" stands for any
+    # coding not listed by name.
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.lower()] = q
+    q = weights.get("gzip", weights.get("x-gzip", weights.get("*", 0.0)))
+    return q > 0
+
+
+@app.get("/orders/export", dependencies=[Depends(require_token)])
+async def export_orders(request: Request, after_id: int | None = None):
+    # NDJSON ordered by id. After a dropped connection, resume by passing the
+    # id of the last complete line as after_id.
+    compress = accepts_gzip(request.headers.get("accept-encoding", ""))
+    headers = {"Content-Encoding": "gzip"} if compress else {}
+    return StreamingResponse(stream_orders(after_id, compress),
+                             media_type="application/x-ndjson", headers=headers)
+
+
+@app.get("/orders/{order_id}", response_model=Order, dependencies=[Depends(require_token)])
+async def read_order_by_id(order_id: int, session: Annotated[AsyncSession, Depends(get_read_session)]):
     try:
-        order = session.get(Order, order_id)
+        order = await session.get(Order, order_id)
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         return order
@@ -69,14 +171,83 @@ def read_order_by_id(order_id: int, session: Annotated[Session, Depends(get_sess
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.put("/orders/{order_id}", response_model=Order)
-def update_order(
+@app.get("/orders/{order_id}/lines", response_model=list[OrderLine], dependencies=[Depends(require_token)])
+async def read_order_lines(order_id: int, session: Annotated[AsyncSession, Depends(get_read_session)]):
+    try:
+        statement = select(OrderLine).where(OrderLine.order_id == order_id).order_by(OrderLine.id)
+        return (await session.exec(statement)).scalars().all()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def open_status_watch(order_id: int, session: AsyncSession) -> tuple[Subscription, dict]:
+    # Subscribes before reading the current status, so a change committed in
+    # between still reaches the client. The read goes to the primary; a
+    # lagging replica could hand back a status the stream has already passed.
+    subscription = status_hub.subscribe(order_id)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many open order streams", headers={"Retry-After": "5"})
+    try:
+        order = await session.get(Order, order_id)
+    except Exception:
+        status_hub.unsubscribe(subscription)
+        raise
+    if order is None:
+        status_hub.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="Order not found")
+    return subscription, {"id": order.id, "user_id": order.user_id, "status": order.status,
+                          "total_amount": order.total_amount}
+
+
+@app.get("/orders/{order_id}/events", dependencies=[Depends(require_stream_token)])
+async def stream_order_status(order_id: int, session: Annotated[AsyncSession, Depends(get_session)]):
+    # Server-Sent Events: the current status, then every change, until the
+    # checkout is confirmed or compensated. Replaces polling GET /orders/{id}.
+    subscription, current = await open_status_watch(order_id, session)
+
+    async def events() -> AsyncGenerator[bytes, None]:
+        async for status in status_hub.watch(subscription, current):
+            if status is None:
+                yield b": heartbeat\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(status, separators=(',', ':'))}\n\n".encode("utf-8")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.websocket("/orders/{order_id}/ws")
+async def watch_order_status(websocket: WebSocket, order_id: int):
+    # The same stream over a WebSocket. Browsers can't set headers on one, so
+    # the token comes in the query string.
+    try:
+        if settings.AUTH_REQUIRED:
+            await get_token_claims(websocket.query_params.get("token"))
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            subscription, current = await open_status_watch(order_id, session)
+    except HTTPException as e:
+        await websocket.close(code=1013 if e.status_code == 503 else 1008, reason=str(e.detail))
+        return
+
+    await websocket.accept()
+    try:
+        # aclosing, so a client that drops off is unsubscribed right away.
+        async with aclosing(status_hub.watch(subscription, current)) as updates:
+            async for status in updates:
+                await websocket.send_json(status if status is not None else {"heartbeat": True})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.put("/orders/{order_id}", response_model=Order, dependencies=[Depends(require_token)])
+async def update_order(
     order_id: int,
-    updated_order: Order,
-    session: Annotated[Session, Depends(get_session)]
+    updated_order: OrderUpdate,
+    session: Annotated[AsyncSession, Depends(get_session)]
 ) -> Order:
     try:
-        order = session.get(Order, order_id)
+        order = await session.get(Order, order_id)
         if not order:
             raise HTTPException(status_code=404, detail="order not found")
 
@@ -85,22 +256,24 @@ def update_order(
             setattr(order, key, value)
 
         session.add(order)
-        session.commit()
-        session.refresh(order)
+        await session.commit()
+        await session.refresh(order)
         return order
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.delete("/orders/{order_id}")
-def delete_order(order_id: int, session: Annotated[Session, Depends(get_session)]):
+@app.delete("/orders/{order_id}", dependencies=[Depends(require_token)])
+async def delete_order(order_id: int, session: Annotated[AsyncSession, Depends(get_session)]):
     try:
-        order = session.get(Order, order_id)
+        order = await session.get(Order, order_id)
         if not order:
             raise HTTPException(status_code=404, detail="Product not found")
 
-        session.delete(order)
-        session.commit()
+        await session.delete(order)
+        await session.commit()
         return {"detail": "Order deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
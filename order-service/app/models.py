@@ -1,15 +1,80 @@
 #models.py
 
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, ForeignKey, Index, Integer, LargeBinary, text
 from typing import  Optional
 from datetime import datetime
 
 
 class Order(SQLModel, table=True):
     id: Optional[int] = Field(primary_key=True)
+    user_id: int = Field(index=True)
+    # A product reference, on orders placed before order lines only. Newer
+    # orders keep their products in OrderLine and the quantity in item_count.
+    products: Optional[int] = None
+    item_count: Optional[int] = None
+    total_amount: float
+    # Checkout progress, driven by app.saga: pending -> reserved -> paid ->
+    # confirmed, or compensated when a step fails or times out.
+    status: str = Field(default="pending")
+    status_updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    # The saga's timeout sweep scans open checkouts by age (migration 0004).
+    __table_args__ = (
+        Index("ix_order_open_checkouts", "status_updated_at",
+              postgresql_where=text("status IN ('pending', 'reserved')")),
+    )
+
+
+class OrderLine(SQLModel, table=True):
+    # unit_price is the product's price when the order was placed.
+    id: Optional[int] = Field(default=None, primary_key=True)
+    order_id: int = Field(sa_column=Column(Integer, ForeignKey("order.id", ondelete="CASCADE"),
+                                           nullable=False, index=True))
+    product_id: int
+    quantity: int
+    unit_price: float
+
+
+class OrderLineIn(SQLModel):
+    product_id: int
+    quantity: int = Field(gt=0)
+
+
+class OrderCreate(SQLModel):
     user_id: int
-    products: int
+    lines: list[OrderLineIn] = Field(min_length=1)
+
+
+class OrderUpdate(SQLModel):
+    # Status, timestamps and the amounts belong to the saga and the order
+    # lines, so clients can't set them.
+    user_id: Optional[int] = None
+
+
+class OrderWithLines(SQLModel):
+    id: int
+    user_id: int
+    item_count: int
     total_amount: float
+    status: str
+    lines: list[OrderLine]
+
+
+class OutboxEvent(SQLModel, table=True):
+    # Events are written in the same transaction as the entity they describe
+    # and published to Kafka afterwards by the outbox relay.
+    __table_args__ = (
+        Index("ix_outboxevent_unpublished", "id",
+              postgresql_where=text("published_at IS NULL")),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    topic: str
+    key: Optional[str] = None
+    payload: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    published_at: Optional[datetime] = Field(default=None, index=True)
 
 
 # from sqlmodel import SQLModel, Field
@@ -23,4 +88,3 @@ class Order(SQLModel, table=True):
 #     products: int   
 #     total_amount: float
 #     status: str
-
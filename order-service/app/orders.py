@@ -0,0 +1,74 @@
+#orders.py
+from collections import defaultdict
+from typing import Any
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.types import Integer
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Order, OrderCreate, OrderLine
+from app.outbox import add_outbox_event
+from app.saga import start_checkout
+
+# One statement prices every line from the product table, inserts the order
+# with its total and item count summed in the database, inserts all lines
+# with a single multi-row INSERT ... SELECT and returns the lot. If any
+# product is missing the HAVING drops the header, so nothing is written.
+_CREATE = text(f"""
+    WITH requested AS (
+        SELECT * FROM unnest(:product_ids, :quantities) WITH ORDINALITY AS r(product_id, quantity, line_no)
+    ), priced AS (
+        SELECT r.line_no, r.product_id, r.quantity, p.price AS unit_price
+        FROM requested r JOIN product p ON p.id = r.product_id
+    ), new_order AS (
+        INSERT INTO "{Order.__tablename__}" (user_id, item_count, total_amount)
+        SELECT CAST(:user_id AS integer), SUM(quantity), SUM(quantity * unit_price) FROM priced
+        HAVING COUNT(*) = CAST(:line_count AS integer)
+        RETURNING *
+    ), new_lines AS (
+        INSERT INTO {OrderLine.__tablename__} (order_id, product_id, quantity, unit_price)
+        SELECT new_order.id, priced.product_id, priced.quantity, priced.unit_price
+        FROM new_order CROSS JOIN priced
+        ORDER BY priced.line_no
+        RETURNING *
+    )
+    SELECT new_order.*,
+           (SELECT json_agg(new_lines ORDER BY new_lines.id) FROM new_lines) AS lines
+    FROM new_order
+""").bindparams(
+    bindparam("product_ids", type_=ARRAY(Integer)),
+    bindparam("quantities", type_=ARRAY(Integer)),
+)
+
+_EXISTING = text("SELECT id FROM product WHERE id = ANY(:ids)").bindparams(
+    bindparam("ids", type_=ARRAY(Integer)),
+)
+
+
+async def create_order(session: AsyncSession, order: OrderCreate) -> tuple[dict[str, Any] | None, list[int]]:
+    # Returns the order with its lines, or None and the product ids that
+    # don't exist. Several lines for one product are merged.
+    quantities: dict[int, int] = defaultdict(int)
+    for line in order.lines:
+        quantities[line.product_id] += line.quantity
+    product_ids = list(quantities)
+
+    row = (await session.exec(_CREATE, params={
+        "user_id": order.user_id,
+        "product_ids": product_ids,
+        "quantities": [quantities[product_id] for product_id in product_ids],
+        "line_count": len(product_ids),
+    })).mappings().first()
+    if row is None:
+        await session.rollback()
+        found = set((await session.exec(_EXISTING, params={"ids": product_ids})).scalars())
+        return None, [product_id for product_id in product_ids if product_id not in found]
+
+    created = dict(row)
+    header = {field: created[field] for field in ("id", "user_id", "products", "item_count", "total_amount")}
+    add_outbox_event(session, "orders", "order", header, key=str(header["id"]))
+    # The order goes out pending; the saga takes it from here.
+    start_checkout(session, created)
+    await session.commit()
+    return created, []
@@ -0,0 +1,109 @@
+#outbox.py
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from aiokafka import AIOKafkaProducer
+from sqlalchemy import delete, func, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import settings
+from app.db_engine import engine
+from app.events import encode_event
+from app.models import OutboxEvent
+
+# Progress of the relay in this process, mostly useful when tuning batch size.
+relay_stats = {"published": 0, "batches": 0, "last_published_id": None, "purged": 0}
+
+
+def add_outbox_event(session: AsyncSession, topic: str, event_type: str, data: dict,
+                     key: str | None = None) -> OutboxEvent:
+    # Only stages the event; it is committed together with the caller's changes.
+    payload = encode_event(event_type, data, settings.EVENT_ENCODING)
+    event = OutboxEvent(topic=topic, key=key, payload=payload)
+    session.add(event)
+    return event
+
+
+async def _take_relay_lock(session: AsyncSession) -> bool:
+    # Only one relay publishes at a time, across every replica and service
+    # sharing the outbox table. With SKIP LOCKED alone two relays could send
+    # consecutive batches at once, and events for the same key could reach
+    # Kafka out of id order. The lock is released when the batch commits.
+    statement = select(func.pg_try_advisory_xact_lock(settings.OUTBOX_RELAY_LOCK_ID))
+    return (await session.exec(statement)).one()
+
+
+async def _claim_batch(session: AsyncSession) -> list[OutboxEvent]:
+    statement = (
+        select(OutboxEvent)
+        .where(OutboxEvent.published_at == None)  # noqa: E711
+        .order_by(OutboxEvent.id)
+        .limit(settings.OUTBOX_RELAY_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    )
+    return list((await session.exec(statement)).all())
+
+
+async def _mark_published(session: AsyncSession, ids: list[int]) -> None:
+    await session.exec(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(ids))
+        .values(published_at=datetime.utcnow())
+    )
+    await session.commit()
+
+
+async def purge_published_events() -> int:
+    cutoff = datetime.utcnow() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    async with AsyncSession(engine) as session:
+        result = await session.exec(delete(OutboxEvent).where(OutboxEvent.published_at < cutoff))
+        await session.commit()
+        return result.rowcount
+
+
+async def relay_batch(producer: AIOKafkaProducer) -> int:
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        if not await _take_relay_lock(session):
+            return 0  # another relay is publishing
+        events = await _claim_batch(session)
+        if not events:
+            return 0
+
+        # send() only enqueues into the producer's batches; wait for all the
+        # deliveries together so the whole batch costs one broker round trip.
+        deliveries = []
+        for event in events:
+            key = event.key.encode("utf-8") if event.key else None
+            deliveries.append(await producer.send(event.topic, event.payload, key=key))
+        await asyncio.gather(*deliveries)
+
+        # If anything above fails the rows stay locked only until the session
+        # closes and are retried on the next pass (at-least-once delivery).
+        ids = [event.id for event in events]
+        await _mark_published(session, ids)
+
+    relay_stats["published"] += len(ids)
+    relay_stats["batches"] += 1
+    relay_stats["last_published_id"] = ids[-1]
+    return len(ids)
+
+
+async def run_outbox_relay(producer: AIOKafkaProducer) -> None:
+    last_purge = time.monotonic()
+    while True:
+        try:
+            published = await relay_batch(producer)
+            if time.monotonic() - last_purge > settings.OUTBOX_PURGE_INTERVAL_SECONDS:
+                relay_stats["purged"] += await purge_published_events()
+                last_purge = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Outbox relay failed: {e}")
+            published = 0
+
+        # Keep draining while there is a backlog, otherwise poll.
+        if published < settings.OUTBOX_RELAY_BATCH_SIZE:
+            await asyncio.sleep(settings.OUTBOX_RELAY_INTERVAL_SECONDS)
@@ -0,0 +1,174 @@
+#saga.py
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any
+
+from aiokafka import ConsumerRecord
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.consumer import handles
+from app.db_engine import engine
+from app.events import EventDecodeError, decode_event
+from app.models import Order, OrderLine
+from app.outbox import add_outbox_event
+from app import settings
+
+# The checkout saga is orchestrated from here. Every command is staged in the
+# outbox in the same transaction as the status change that calls for it, and
+# inventory and payment handle each command idempotently, so redelivered
+# commands and replies are harmless.
+#
+#   pending   --reserve ok-->  reserved   (charge sent)
+#   pending   --reserve fail-> compensated
+#   reserved  --charge ok--->  paid       (commit sent)
+#   reserved  --charge fail->  compensated (release sent)
+#   paid      --commit ok--->  confirmed
+#   pending / reserved past CHECKOUT_TIMEOUT_SECONDS -> compensated (release sent,
+#       and refund if reserved, which cancels a payment intent not yet confirmed)
+#
+# The charge reply only comes once the customer has confirmed the payment in
+# the storefront (payment-service answers from Stripe's webhook). A charge
+# that succeeds after its checkout was compensated is refunded.
+OPEN_STATES = ("pending", "reserved")
+
+saga_stats = {"started": 0, "confirmed": 0, "compensated": 0, "timed_out": 0,
+              "refunded": 0, "ignored_replies": 0}
+
+
+def stage_command(session: AsyncSession, topic: str, order_id: int, action: str,
+                  lines: list[dict[str, Any]] | None = None, amount: float = 0.0) -> None:
+    lines = lines or []
+    add_outbox_event(session, topic, "checkout_command", {
+        "order_id": order_id, "action": action,
+        "product_ids": [line["product_id"] for line in lines],
+        "quantities": [line["quantity"] for line in lines],
+        "amount": amount,
+    }, key=str(order_id))
+
+
+def stage_status_event(session: AsyncSession, order: dict[str, Any]) -> None:
+    add_outbox_event(session, "orders", "order_status", {
+        "id": order["id"], "user_id": order["user_id"], "status": order["status"],
+        "total_amount": order["total_amount"],
+    }, key=str(order["id"]))
+
+
+def start_checkout(session: AsyncSession, order: dict[str, Any]) -> None:
+    # Called while the new order is still uncommitted.
+    stage_command(session, settings.CHECKOUT_INVENTORY_TOPIC, order["id"], "reserve", order["lines"])
+    stage_status_event(session, order)
+    saga_stats["started"] += 1
+
+
+async def _lines(session: AsyncSession, order_id: int) -> list[dict[str, Any]]:
+    statement = select(OrderLine).where(OrderLine.order_id == order_id).order_by(OrderLine.id)
+    return [{"product_id": line.product_id, "quantity": line.quantity}
+            for line in (await session.exec(statement)).all()]
+
+
+def _move(session: AsyncSession, order: Order, status: str) -> None:
+    order.status = status
+    order.status_updated_at = datetime.utcnow()
+    session.add(order)
+    stage_status_event(session, order.dict())
+    if status in ("confirmed", "compensated"):
+        saga_stats[status] += 1
+
+
+async def _apply_reply(session: AsyncSession, order: Order, action: str, ok: bool) -> bool:
+    # Returns False for a reply that doesn't fit the order's current state:
+    # a duplicate, or one that lost the race with a timeout.
+    if action == "reserve" and order.status == "pending":
+        if ok:
+            _move(session, order, "reserved")
+            stage_command(session, settings.CHECKOUT_PAYMENT_TOPIC, order.id, "charge", amount=order.total_amount)
+        else:
+            # A rejected reservation took no stock, so there is nothing to undo.
+            _move(session, order, "compensated")
+        return True
+    if action == "charge" and order.status == "reserved":
+        if ok:
+            _move(session, order, "paid")
+            stage_command(session, settings.CHECKOUT_INVENTORY_TOPIC, order.id, "commit")
+        else:
+            _move(session, order, "compensated")
+            stage_command(session, settings.CHECKOUT_INVENTORY_TOPIC, order.id, "release",
+                          await _lines(session, order.id))
+        return True
+    if action == "charge" and ok and order.status == "compensated":
+        stage_command(session, settings.CHECKOUT_PAYMENT_TOPIC, order.id, "refund", amount=order.total_amount)
+        saga_stats["refunded"] += 1
+        return True
+    if action == "commit" and order.status == "paid":
+        if ok:
+            _move(session, order, "confirmed")
+        else:
+            # The reservation is gone, so the payment is handed back.
+            _move(session, order, "compensated")
+            stage_command(session, settings.CHECKOUT_PAYMENT_TOPIC, order.id, "refund", amount=order.total_amount)
+            saga_stats["refunded"] += 1
+        return True
+    return False
+
+
+@handles(settings.CHECKOUT_REPLY_TOPIC)
+async def handle_checkout_reply(record: ConsumerRecord) -> None:
+    try:
+        event = decode_event(record.value)
+    except EventDecodeError:
+        return
+    if event.type != "checkout_reply":
+        return
+    reply = event.data
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        # The row lock orders this reply against the timeout sweep.
+        statement = select(Order).where(Order.id == reply["order_id"]).with_for_update()
+        order = (await session.exec(statement)).first()
+        if order is None or not await _apply_reply(session, order, reply["action"], reply["ok"]):
+            if reply["action"] not in ("release", "refund"):
+                saga_stats["ignored_replies"] += 1
+                print(f"Ignoring {reply['action']} reply for order {reply['order_id']}"
+                      f" ({order.status if order else 'missing'})")
+            return
+        if not reply["ok"]:
+            print(f"Checkout of order {order.id} failed at {reply['action']}: {reply['reason']}")
+        await session.commit()
+
+
+async def expire_checkouts() -> int:
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.CHECKOUT_TIMEOUT_SECONDS)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        # SKIP LOCKED leaves orders a reply is updating right now, and lets
+        # several replicas sweep at once.
+        statement = (select(Order)
+                     .where(Order.status.in_(OPEN_STATES), Order.status_updated_at < cutoff)
+                     .order_by(Order.status_updated_at)
+                     .limit(100)
+                     .with_for_update(skip_locked=True))
+        orders = (await session.exec(statement)).all()
+        for order in orders:
+            # Release even when pending: the reserve may have been applied
+            # with its reply still on the way. Inventory ignores a release
+            # for nothing, and turns away a reserve that arrives after it.
+            stage_command(session, settings.CHECKOUT_INVENTORY_TOPIC, order.id, "release",
+                          await _lines(session, order.id))
+            if order.status == "reserved":
+                # The charge was sent; stop the customer paying for a
+                # checkout that is gone.
+                stage_command(session, settings.CHECKOUT_PAYMENT_TOPIC, order.id, "refund",
+                              amount=order.total_amount)
+            _move(session, order, "compensated")
+            saga_stats["timed_out"] += 1
+        await session.commit()
+    return len(orders)
+
+
+async def expire_checkouts_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.CHECKOUT_SWEEP_SECONDS)
+        try:
+            await expire_checkouts()
+        except Exception as e:
+            print(f"Expiring checkouts failed: {e}")
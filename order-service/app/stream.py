@@ -0,0 +1,104 @@
+#stream.py
+import asyncio
+from collections import defaultdict
+from typing import Any, AsyncIterator
+
+from app import settings
+
+FINAL_STATES = ("confirmed", "compensated")
+# Checkout only moves forward, so this tells a late event from a new one.
+_PROGRESS = {"pending": 0, "reserved": 1, "paid": 2, "confirmed": 3, "compensated": 3}
+
+
+class Subscription:
+    # Only the newest status matters to a watcher, so a slow client never
+    # builds up a queue: a status that arrives before the previous one was
+    # sent simply replaces it.
+    def __init__(self, order_id: int) -> None:
+        self.order_id = order_id
+        self.latest: dict[str, Any] | None = None
+        self.ready = asyncio.Event()
+
+    def offer(self, status: dict[str, Any]) -> bool:
+        replaced = self.latest is not None
+        if replaced and _PROGRESS.get(status["status"], 0) < _PROGRESS.get(self.latest["status"], 0):
+            return True  # a late event mustn't hide a newer one still waiting
+        self.latest = status
+        self.ready.set()
+        return replaced
+
+    def take(self) -> dict[str, Any] | None:
+        status, self.latest = self.latest, None
+        self.ready.clear()
+        return status
+
+
+class OrderStatusHub:
+    # Per-process registry of clients watching orders. One group-less
+    # consumer of the orders topic feeds it, whatever the number of clients.
+    def __init__(self, max_subscribers: int) -> None:
+        self.max_subscribers = max_subscribers
+        self._subscriptions: dict[int, set[Subscription]] = defaultdict(set)
+        self.subscribers = 0
+        self.published = 0
+        self.delivered = 0
+        self.conflated = 0
+        self.rejected = 0
+
+    def subscribe(self, order_id: int) -> Subscription | None:
+        if self.subscribers >= self.max_subscribers:
+            self.rejected += 1
+            return None
+        subscription = Subscription(order_id)
+        self._subscriptions[order_id].add(subscription)
+        self.subscribers += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        watchers = self._subscriptions.get(subscription.order_id)
+        if watchers is None or subscription not in watchers:
+            return
+        watchers.discard(subscription)
+        if not watchers:
+            del self._subscriptions[subscription.order_id]
+        self.subscribers -= 1
+
+    def publish(self, status: dict[str, Any]) -> None:
+        self.published += 1
+        for subscription in self._subscriptions.get(status["id"], ()):
+            if subscription.offer(status):
+                self.conflated += 1
+
+    async def watch(self, subscription: Subscription,
+                    current: dict[str, Any]) -> AsyncIterator[dict[str, Any] | None]:
+        # Yields the current status, then each change, and None whenever
+        # STREAM_HEARTBEAT_SECONDS pass quietly. Ends after a final status.
+        # Subscribe before reading current, so no change is missed between.
+        try:
+            status, sent = current, -1
+            while True:
+                # An event no newer than what was already sent (redelivered,
+                # or older than the initial read) is skipped.
+                if status is not None and _PROGRESS.get(status["status"], 0) > sent:
+                    sent = _PROGRESS.get(status["status"], 0)
+                    self.delivered += 1
+                    yield status
+                    if status["status"] in FINAL_STATES:
+                        return
+                try:
+                    await asyncio.wait_for(subscription.ready.wait(), settings.STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+                    status = None
+                    continue
+                status = subscription.take()
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict[str, Any]:
+        return {"subscribers": self.subscribers, "orders_watched": len(self._subscriptions),
+                "max_subscribers": self.max_subscribers, "published": self.published,
+                "delivered": self.delivered, "conflated": self.conflated, "rejected": self.rejected}
+
+
+status_hub = OrderStatusHub(settings.STREAM_MAX_SUBSCRIBERS)
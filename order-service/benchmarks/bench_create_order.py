@@ -0,0 +1,73 @@
+#bench_create_order.py
+#
+# POST /orders/ latency for carts of 1, 50 and 500 lines. The order, all its
+# lines and the total are written in one statement, so latency should grow
+# far slower than the line count. Products are created through the product
+# service first.
+#
+#   poetry run python -m benchmarks.bench_create_order --url http://localhost:8082 \
+#       --product-url http://localhost:8083 --lines 1 50 500
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+
+async def create_products(client: httpx.AsyncClient, count: int) -> list[int]:
+    ids = []
+    for i in range(count):
+        response = await client.post("/products/", json={"name": f"cart-{i}", "description": "order benchmark",
+                                                         "price": round(random.uniform(1, 100), 2),
+                                                         "quantity": 1000})
+        response.raise_for_status()
+        ids.append(response.json()["id"])
+    return ids
+
+
+async def place_orders(client: httpx.AsyncClient, product_ids: list[int], lines: int,
+                       requests: int, concurrency: int) -> list[float]:
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def place() -> None:
+        cart = [{"product_id": product_id, "quantity": random.randint(1, 5)}
+                for product_id in random.sample(product_ids, lines)]
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/orders/", json={"user_id": 1, "lines": cart})
+            latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        assert len(response.json()["lines"]) == lines
+
+    await asyncio.gather(*(place() for _ in range(requests)))
+    return latencies
+
+
+async def run(args: argparse.Namespace) -> None:
+    async with httpx.AsyncClient(base_url=args.product_url, timeout=60) as products:
+        product_ids = await create_products(products, max(args.lines))
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        await place_orders(client, product_ids, 1, 10, 1)  # warm up
+        for lines in args.lines:
+            latencies = sorted(await place_orders(client, product_ids, lines, args.requests, args.concurrency))
+            p50 = statistics.median(latencies) * 1000
+            p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000
+            print(f"lines={lines}: n={len(latencies)} p50={p50:.2f}ms p99={p99:.2f}ms "
+                  f"per line={p50 / lines:.3f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Order creation latency by cart size")
+    parser.add_argument("--url", default="http://localhost:8082")
+    parser.add_argument("--product-url", default="http://localhost:8083")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
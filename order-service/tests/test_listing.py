@@ -0,0 +1,35 @@
+import json
+from datetime import datetime
+
+from app.main import accepts_gzip, export_line
+from app.models import OrderUpdate
+from app.pagination import page_response
+
+ROW = {"id": 1, "user_id": 2, "item_count": 3, "total_amount": 10.0,
+       "status": "reserved", "status_updated_at": datetime(2024, 5, 1, 12, 30)}
+
+
+def test_page_of_orders_with_status()->None:
+    response = page_response([ROW], next_cursor=None)
+    assert json.loads(response.body) == [dict(ROW, status_updated_at="2024-05-01T12:30:00")]
+
+
+def test_export_line_of_order_with_status()->None:
+    line = export_line(ROW)
+    assert line.endswith("\n")
+    assert json.loads(line)["status_updated_at"] == "2024-05-01T12:30:00"
+
+
+def test_update_leaves_saga_fields_out()->None:
+    update = OrderUpdate.model_validate({"user_id": 4, "status": "confirmed", "total_amount": 0.0})
+    assert update.model_dump(exclude_unset=True) == {"user_id": 4}
+
+
+def test_export_gzip_follows_q_values()->None:
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("br;q=1.0, gzip;q=0.5")
+    assert accepts_gzip("*")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("gzip; q=0.000, *")
+    assert not accepts_gzip("*;q=0")
+    assert not accepts_gzip("")
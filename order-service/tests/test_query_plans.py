@@ -0,0 +1,46 @@
+#test_query_plans.py
+from pathlib import Path
+from typing import Any, Iterator
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+
+from app import settings
+
+# Hot-path lookups that must be served by an index.
+LOOKUPS = {
+    "orders_by_user": """SELECT * FROM "order" WHERE user_id = 42""",
+    "order_lines": """SELECT * FROM orderline WHERE order_id = 42""",
+}
+
+
+@pytest.fixture(scope="module")
+def connection():
+    url = str(settings.TEST_DATABASE_URL).replace("postgresql", "postgresql+psycopg")
+    config = Config(str(Path(__file__).parent.parent / "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    command.upgrade(config, "head")
+
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        # On a near-empty test table the planner prefers a sequential scan even
+        # when an index exists. With seqscan disabled it still picks one only if
+        # no index can serve the predicate.
+        connection.execute(text("SET enable_seqscan = off"))
+        yield connection
+    engine.dispose()
+
+
+def plan_nodes(plan: dict[str, Any]) -> Iterator[str]:
+    yield plan["Node Type"]
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+@pytest.mark.parametrize("lookup", LOOKUPS)
+def test_lookup_avoids_sequential_scan(connection, lookup: str) -> None:
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {LOOKUPS[lookup]}")).scalar()
+    nodes = list(plan_nodes(plan[0]["Plan"]))
+    assert "Seq Scan" not in nodes, f"{lookup} plans a sequential scan: {nodes}"
@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app import saga, settings
+from app.events import decode_event, encode_event
+from app.models import Order, OrderLine
+
+
+class FakeResult:
+    def __init__(self, rows: list) -> None:
+        self.rows = rows
+
+    def all(self) -> list:
+        return self.rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeSession:
+    # Hands out the queued results in order, one per exec, and keeps what
+    # was added so the staged outbox events can be checked.
+    def __init__(self, *results: list) -> None:
+        self.results = list(results)
+        self.added = []
+
+    def add(self, obj) -> None:
+        self.added.append(obj)
+
+    async def exec(self, statement) -> FakeResult:
+        return FakeResult(self.results.pop(0))
+
+    async def commit(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+
+def order(status: str) -> Order:
+    return Order(id=1, user_id=2, item_count=3, total_amount=20.0, status=status)
+
+
+def lines() -> list[OrderLine]:
+    return [OrderLine(id=1, order_id=1, product_id=7, quantity=3, unit_price=5.0)]
+
+
+def commands(session: FakeSession) -> list[tuple[str, str]]:
+    staged = [decode_event(obj.payload) for obj in session.added if hasattr(obj, "payload")]
+    return [(event.data["action"], event.data["order_id"]) for event in staged if event.type == "checkout_command"]
+
+
+def reply(session: FakeSession, current: Order, action: str, ok: bool) -> bool:
+    return asyncio.run(saga._apply_reply(session, current, action, ok))
+
+
+def test_happy_path_moves_to_confirmed()->None:
+    current = order("pending")
+    steps = [("reserve", "reserved", "charge"), ("charge", "paid", "commit"), ("commit", "confirmed", None)]
+    for action, status, command in steps:
+        session = FakeSession()
+        assert reply(session, current, action, True)
+        assert current.status == status
+        assert commands(session) == ([(command, 1)] if command else [])
+        # The same reply again finds the order moved on and changes nothing.
+        again = FakeSession()
+        assert not reply(again, current, action, True)
+        assert again.added == []
+
+
+def test_failures_compensate()->None:
+    rejected = order("pending")
+    session = FakeSession()
+    assert reply(session, rejected, "reserve", False)
+    assert rejected.status == "compensated" and commands(session) == []
+
+    declined = order("reserved")
+    session = FakeSession(lines())
+    assert reply(session, declined, "charge", False)
+    assert declined.status == "compensated" and commands(session) == [("release", 1)]
+
+    lost = order("paid")
+    session = FakeSession()
+    assert reply(session, lost, "commit", False)
+    assert lost.status == "compensated" and commands(session) == [("refund", 1)]
+
+
+def test_late_charge_is_refunded()->None:
+    session = FakeSession()
+    assert reply(session, order("compensated"), "charge", True)
+    assert commands(session) == [("refund", 1)]
+    assert not reply(FakeSession(), order("compensated"), "charge", False)
+
+
+def test_timeout_compensates_open_checkouts(monkeypatch)->None:
+    stale = order("reserved")
+    stale.status_updated_at = datetime.utcnow() - timedelta(seconds=settings.CHECKOUT_TIMEOUT_SECONDS + 1)
+    session = FakeSession([stale], lines())
+    monkeypatch.setattr(saga, "AsyncSession", lambda *args, **kwargs: session)
+
+    assert asyncio.run(saga.expire_checkouts()) == 1
+    assert stale.status == "compensated"
+    # The refund cancels the payment intent the customer hasn't confirmed.
+    assert commands(session) == [("release", 1), ("refund", 1)]
+    # A reply that lost the race with the timeout is ignored.
+    assert not reply(FakeSession(), stale, "charge", False)
+
+
+def test_confirmed_through_the_payment_webhook(monkeypatch)->None:
+    # The replies as inventory and payment send them; the charge reply is
+    # the one payment-service sends when Stripe's webhook reports the
+    # customer's confirmed intent as succeeded.
+    current = order("pending")
+    monkeypatch.setattr(saga, "AsyncSession", lambda *args, **kwargs: FakeSession([current]))
+    for action in ("reserve", "charge", "commit"):
+        record = SimpleNamespace(value=encode_event("checkout_reply", {
+            "order_id": 1, "action": action, "ok": True, "reason": ""}))
+        asyncio.run(saga.handle_checkout_reply(record))
+    assert current.status == "confirmed"
@@ -0,0 +1,56 @@
+import asyncio
+
+from app.stream import OrderStatusHub
+
+
+def status(value: str) -> dict:
+    return {"id": 1, "user_id": 2, "status": value, "total_amount": 10.0}
+
+
+def test_streams_changes_until_final_status()->None:
+    hub = OrderStatusHub(max_subscribers=10)
+
+    async def main():
+        subscription = hub.subscribe(1)
+        received = []
+
+        async def client():
+            async for update in hub.watch(subscription, status("pending")):
+                received.append(update["status"])
+
+        task = asyncio.create_task(client())
+        await asyncio.sleep(0.01)
+        for value in ("pending", "reserved", "paid", "confirmed"):
+            hub.publish(status(value))
+            await asyncio.sleep(0.01)
+        await asyncio.wait_for(task, 1)
+        return received
+
+    assert asyncio.run(main()) == ["pending", "reserved", "paid", "confirmed"]
+    assert hub.stats()["subscribers"] == 0
+
+
+def test_slow_client_gets_only_the_latest_status()->None:
+    hub = OrderStatusHub(max_subscribers=10)
+
+    async def main():
+        subscription = hub.subscribe(1)
+        updates = hub.watch(subscription, status("pending"))
+        assert (await anext(updates))["status"] == "pending"
+        # Three changes before the client reads again, and one stale event.
+        for value in ("reserved", "paid", "compensated", "pending"):
+            hub.publish(status(value))
+        assert (await anext(updates))["status"] == "compensated"
+        await updates.aclose()
+
+    asyncio.run(main())
+    assert hub.conflated == 3
+
+
+def test_subscriber_limit()->None:
+    hub = OrderStatusHub(max_subscribers=1)
+    first = hub.subscribe(1)
+    assert hub.subscribe(2) is None
+    hub.unsubscribe(first)
+    assert hub.subscribe(2) is not None
+    assert hub.rejected == 1
@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app import auth, settings
+
+
+def test_stream_token_from_header_or_query(monkeypatch)->None:
+    seen = []
+
+    async def claims(token):
+        if token is None:
+            raise HTTPException(status_code=401)
+        seen.append(token)
+        return {"sub": "alice"}
+
+    monkeypatch.setattr(settings, "AUTH_REQUIRED", True)
+    monkeypatch.setattr(auth, "get_token_claims", claims)
+    asyncio.run(auth.require_stream_token(token="from-header", query_token=None))
+    asyncio.run(auth.require_stream_token(token=None, query_token="from-query"))
+    assert seen == ["from-header", "from-query"]
+    with pytest.raises(HTTPException):
+        asyncio.run(auth.require_stream_token(token=None, query_token=None))
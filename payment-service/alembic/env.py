@@ -0,0 +1,65 @@
+#env.py
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+
+from app import models  # noqa: F401  (registers the tables on SQLModel.metadata)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = SQLModel.metadata
+
+# All services share one database, so each keeps its own version table.
+VERSION_TABLE = "alembic_version_payment"
+
+
+def get_url() -> str:
+    # Tests point migrations at their own database through sqlalchemy.url.
+    url = config.get_main_option("sqlalchemy.url")
+    if url:
+        return url
+    from app.db_engine import connection_string
+    return connection_string
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    # Tables that only exist in the database belong to another service; don't
+    # let autogenerate drop them.
+    return not (type_ == "table" and reflected and compare_to is None)
+
+
+def configure(**kwargs) -> None:
+    context.configure(target_metadata=target_metadata, version_table=VERSION_TABLE,
+                      include_object=include_object, **kwargs)
+
+
+def run_migrations_offline() -> None:
+    configure(url=get_url(), literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    configure(connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    connectable = create_async_engine(get_url(), poolclass=pool.NullPool)
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,35 @@
+"""checkout payments
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("payment", sa.Column("order_id", sa.Integer(), nullable=True))
+    op.add_column("payment", sa.Column("status", sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column("payment", sa.Column("provider_reference", sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index("ix_payment_order_id", "payment", ["order_id"], unique=True,
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_payment_order_id", table_name="payment", postgresql_concurrently=True, if_exists=True)
+    op.drop_column("payment", "provider_reference")
+    op.drop_column("payment", "status")
+    op.drop_column("payment", "order_id")
@@ -0,0 +1,150 @@
+#checkout.py
+import asyncio
+
+import stripe
+from aiokafka import ConsumerRecord
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.consumer import handles
+from app.db_engine import engine
+from app.events import EventDecodeError, decode_event, encode_event
+from app.kafka import get_kafka_producer
+from app.models import Payment
+from app import settings
+
+# Checkout saga participant. A payment row per order (order_id is unique)
+# makes repeated commands return the answer already given, and the Stripe
+# idempotency keys cover a crash between calling Stripe and committing.
+# Replies are sent after the commit and the command's offset is only
+# committed after that, so a lost reply is sent again on redelivery.
+#
+# A charge is recorded as pending when its intent is created. The storefront
+# fetches the intent's client_secret from GET /payments/by-order/{order_id}
+# and the customer confirms it with Stripe.js; the charge is answered once
+# Stripe says how it ended, through the webhook (settle_payment):
+#   pending --payment_intent.succeeded--> paid    (ok reply)
+#   pending --payment_intent.canceled---> failed  (failed reply)
+# A declined attempt (payment_intent.payment_failed) leaves the intent open
+# for the customer to try another card. The order's checkout timeout covers
+# an intent that is never confirmed, and its refund command cancels it.
+SETTLING_EVENTS = {"payment_intent.succeeded": "paid", "payment_intent.canceled": "failed"}
+
+
+async def _payment_for(session: AsyncSession, order_id: int) -> Payment | None:
+    statement = select(Payment).where(Payment.order_id == order_id).with_for_update()
+    return (await session.exec(statement)).first()
+
+
+def _charge_answer(payment: Payment) -> tuple[bool, str] | None:
+    # None while Stripe hasn't decided yet: the reply waits for the webhook.
+    if payment.status == "pending":
+        return None
+    return payment.status == "paid", "" if payment.status == "paid" else f"payment {payment.status}"
+
+
+async def charge(session: AsyncSession, command: dict) -> tuple[bool, str] | None:
+    order_id = command["order_id"]
+    payment = await _payment_for(session, order_id)
+    if payment is not None:
+        return _charge_answer(payment)
+    try:
+        # The Stripe SDK is blocking, keep it off the event loop.
+        intent = await asyncio.to_thread(
+            stripe.PaymentIntent.create,
+            amount=round(command["amount"] * 100),
+            currency="usd",
+            payment_method_types=["card"],
+            metadata={"order_id": order_id},
+            idempotency_key=f"checkout-{order_id}-charge",
+        )
+    except stripe.error.APIConnectionError:
+        raise  # transient; the consumer retries the command
+    except stripe.error.StripeError as e:
+        session.add(Payment(amount=command["amount"], payment_method="Stripe", order_id=order_id, status="failed"))
+        return False, str(e)
+    payment = Payment(amount=command["amount"], payment_method="Stripe", order_id=order_id,
+                      status=SETTLING_EVENTS.get(f"payment_intent.{intent.status}", "pending"),
+                      provider_reference=intent.id)
+    session.add(payment)
+    return _charge_answer(payment)
+
+
+async def refund(session: AsyncSession, command: dict) -> tuple[bool, str]:
+    order_id = command["order_id"]
+    payment = await _payment_for(session, order_id)
+    if payment is None or payment.status not in ("pending", "paid"):
+        return True, ""
+    if payment.status == "pending":
+        # Nothing was taken yet; cancelling the intent stops it for good.
+        await asyncio.to_thread(stripe.PaymentIntent.cancel, payment.provider_reference,
+                                idempotency_key=f"checkout-{order_id}-cancel")
+        payment.status = "cancelled"
+    else:
+        await asyncio.to_thread(stripe.Refund.create, payment_intent=payment.provider_reference,
+                                idempotency_key=f"checkout-{order_id}-refund")
+        payment.status = "refunded"
+    session.add(payment)
+    return True, ""
+
+
+ACTIONS = {"charge": charge, "refund": refund}
+
+
+async def read_client_secret(session: AsyncSession, order_id: int) -> dict | None:
+    # For the storefront: the intent's client_secret while it still waits to
+    # be confirmed, and the payment status either way.
+    payment = (await session.exec(select(Payment).where(Payment.order_id == order_id))).first()
+    if payment is None:
+        return None
+    client_secret = None
+    if payment.status == "pending":
+        intent = await asyncio.to_thread(stripe.PaymentIntent.retrieve, payment.provider_reference)
+        client_secret = intent.client_secret
+    return {"order_id": order_id, "amount": payment.amount, "status": payment.status,
+            "client_secret": client_secret}
+
+
+async def send_reply(order_id: int, action: str, ok: bool, reason: str) -> None:
+    reply = encode_event("checkout_reply", {"order_id": order_id, "action": action,
+                                            "ok": ok, "reason": reason}, settings.EVENT_ENCODING)
+    producer = await get_kafka_producer()
+    await producer.send_and_wait(settings.CHECKOUT_REPLY_TOPIC, reply, key=str(order_id).encode("utf-8"))
+
+
+async def settle_payment(intent: dict, event_type: str) -> bool:
+    # Called by the Stripe webhook. Returns False when the payment isn't
+    # recorded yet, so Stripe delivers the event again later.
+    if "order_id" not in (intent.get("metadata") or {}):
+        return True  # not a checkout payment
+    order_id = int(intent["metadata"]["order_id"])
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        payment = await _payment_for(session, order_id)
+        if payment is None:
+            return False
+        if payment.status != "pending":
+            return True  # redelivered, or cancelled before it completed
+        payment.status = SETTLING_EVENTS[event_type]
+        session.add(payment)
+        await session.commit()
+    await send_reply(order_id, "charge", payment.status == "paid",
+                     "" if payment.status == "paid" else f"payment {payment.status}")
+    return True
+
+
+@handles(settings.CHECKOUT_PAYMENT_TOPIC)
+async def handle_payment_command(record: ConsumerRecord) -> None:
+    try:
+        event = decode_event(record.value)
+    except EventDecodeError:
+        return
+    if event.type != "checkout_command" or event.data["action"] not in ACTIONS:
+        return
+    command = event.data
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        answer = await ACTIONS[command["action"]](session, command)
+        await session.commit()
+
+    if answer is not None:
+        await send_reply(command["order_id"], command["action"], *answer)
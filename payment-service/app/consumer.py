@@ -0,0 +1,236 @@
+#consumer.py
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable
+
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener, ConsumerRecord, TopicPartition
+from aiokafka.errors import CommitFailedError, IllegalStateError
+
+from app import settings
+from app.events import EventDecodeError, decode_event
+
+Handler = Callable[[ConsumerRecord], Awaitable[None]]
+
+# Handlers registered per topic. Every record is passed to each of them in turn;
+# topics without a handler fall back to log_message.
+_handlers: dict[str, list[Handler]] = defaultdict(list)
+
+
+def register_handler(topic: str, handler: Handler) -> None:
+    _handlers[topic].append(handler)
+
+
+def handles(topic: str) -> Callable[[Handler], Handler]:
+    def decorator(handler: Handler) -> Handler:
+        register_handler(topic, handler)
+        return handler
+    return decorator
+
+
+async def log_message(record: ConsumerRecord) -> None:
+    try:
+        event = decode_event(record.value)
+    except EventDecodeError:
+        print(f"Received undecodable message: {record.value!r} on topic {record.topic}")
+        return
+    print(f"Received {event.type} v{event.version} event: {event.data} on topic {record.topic}")
+
+
+class ConsumerStats:
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        self.commits = 0
+        self.pauses = 0
+        self.per_partition: dict[TopicPartition, int] = defaultdict(int)
+        self.committed: dict[TopicPartition, int] = {}
+
+    def snapshot(self, consumer: AIOKafkaConsumer | None = None) -> dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        partitions = {}
+        for tp, count in self.per_partition.items():
+            entry: dict[str, Any] = {"processed": count, "per_second": round(count / elapsed, 2)}
+            highwater = consumer.highwater(tp) if consumer is not None else None
+            if highwater is not None and tp in self.committed:
+                entry["lag"] = highwater - self.committed[tp]
+            partitions[f"{tp.topic}[{tp.partition}]"] = entry
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "per_second": round(self.processed / elapsed, 2),
+            "batches": self.batches,
+            "commits": self.commits,
+            "pauses": self.pauses,
+            "partitions": partitions,
+        }
+
+
+class _CommitBeforeRevoke(ConsumerRebalanceListener):
+    # Runs inside the rebalance, while the partitions are still ours, so the
+    # offsets of batches already in flight can still be committed.
+    def __init__(self, runner: "ConsumerRunner") -> None:
+        self.runner = runner
+
+    async def on_partitions_revoked(self, revoked: set[TopicPartition]) -> None:
+        await self.runner.drain(settings.KAFKA_CONSUMER_REVOKE_TIMEOUT_SECONDS)
+
+    async def on_partitions_assigned(self, assigned: set[TopicPartition]) -> None:
+        pass
+
+
+class ConsumerRunner:
+    # Pulls records with getmany() and fans them out to a bounded pool of
+    # workers. Records sharing a key (or, without a key, a partition) form a
+    # lane and are handled strictly in order, while different lanes run
+    # concurrently. Offsets are committed manually once every record of a batch,
+    # and of all batches before it, has been handled; before a rebalance takes
+    # partitions away, the batches in flight are finished and committed.
+    def __init__(
+        self,
+        *topics: str,
+        bootstrap_servers: str,
+        group_id: str,
+        max_records: int = settings.KAFKA_CONSUMER_MAX_RECORDS,
+        workers: int = settings.KAFKA_CONSUMER_WORKERS,
+        max_in_flight: int = settings.KAFKA_CONSUMER_MAX_IN_FLIGHT,
+        max_retries: int = settings.KAFKA_CONSUMER_MAX_RETRIES,
+    ) -> None:
+        self.consumer = AIOKafkaConsumer(
+            bootstrap_servers=bootstrap_servers,
+            group_id=group_id,
+            auto_offset_reset="earliest",
+            enable_auto_commit=False,
+        )
+        self.consumer.subscribe(topics=list(topics), listener=_CommitBeforeRevoke(self))
+        self.max_records = max_records
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.stats = ConsumerStats()
+        self._workers = asyncio.Semaphore(workers)
+        self._lanes: dict[tuple[TopicPartition, bytes | None], asyncio.Task[None]] = {}
+        self._pending: deque[tuple[asyncio.Future[Any], dict[TopicPartition, int], int]] = deque()
+        self._in_flight = 0
+        # Commits come from the run loop and from the rebalance listener; one
+        # at a time, so an older batch's offsets can't land after a newer one's.
+        self._commit_lock = asyncio.Lock()
+        self._last_report = time.monotonic()
+
+    async def _handle(self, record: ConsumerRecord) -> None:
+        handlers = _handlers.get(record.topic) or [log_message]
+        for attempt in range(self.max_retries + 1):
+            try:
+                for handler in handlers:
+                    await handler(record)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    # Skip the record rather than wedge the whole partition.
+                    print(f"Giving up on {record.topic}[{record.partition}]@{record.offset}: {e}")
+                    self.stats.failed += 1
+                    return
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        self.stats.processed += 1
+        self.stats.per_partition[TopicPartition(record.topic, record.partition)] += 1
+
+    async def _run_lane(self, previous: asyncio.Task[None] | None, records: list[ConsumerRecord]) -> None:
+        # Wait for the same lane from an earlier batch before taking a worker.
+        if previous is not None:
+            await asyncio.wait({previous})
+        async with self._workers:
+            for record in records:
+                await self._handle(record)
+
+    def _forget_lane(self, lane: tuple[TopicPartition, bytes | None], task: asyncio.Task[None]) -> None:
+        if self._lanes.get(lane) is task:
+            del self._lanes[lane]
+
+    def _dispatch(self, batch: dict[TopicPartition, list[ConsumerRecord]]) -> None:
+        lanes: dict[tuple[TopicPartition, bytes | None], list[ConsumerRecord]] = defaultdict(list)
+        offsets = {}
+        count = 0
+        for tp, records in batch.items():
+            for record in records:
+                lanes[(tp, record.key)].append(record)
+            offsets[tp] = records[-1].offset + 1
+            count += len(records)
+
+        tasks = []
+        for lane, records in lanes.items():
+            task = asyncio.create_task(self._run_lane(self._lanes.get(lane), records))
+            self._lanes[lane] = task
+            task.add_done_callback(lambda t, lane=lane: self._forget_lane(lane, t))
+            tasks.append(task)
+
+        self._pending.append((asyncio.gather(*tasks), offsets, count))
+        self._in_flight += count
+        self.stats.batches += 1
+
+    async def _commit_finished(self) -> None:
+        async with self._commit_lock:
+            await self._commit_finished_locked()
+
+    async def _commit_finished_locked(self) -> None:
+        offsets: dict[TopicPartition, int] = {}
+        while self._pending and self._pending[0][0].done():
+            _, batch_offsets, count = self._pending.popleft()
+            offsets.update(batch_offsets)
+            self._in_flight -= count
+        # A partition revoked while its batch ran belongs to another member
+        # now, which re-delivers from the last committed offset.
+        assigned = self.consumer.assignment()
+        offsets = {tp: offset for tp, offset in offsets.items() if tp in assigned}
+        if not offsets:
+            return
+        try:
+            await self.consumer.commit(offsets)
+            self.stats.commits += 1
+            self.stats.committed.update(offsets)
+        except (CommitFailedError, IllegalStateError) as e:
+            # The group rebalanced between the check and the commit.
+            print(f"Offset commit failed after rebalance: {e}")
+
+    async def drain(self, timeout: float) -> None:
+        # Waits up to timeout for the batches in flight, then commits what
+        # finished. Batches still running after that are committed by
+        # whoever owns their partitions next.
+        if self._pending:
+            await asyncio.wait([future for future, _, _ in self._pending], timeout=timeout)
+        await self._commit_finished()
+
+    async def _apply_backpressure(self) -> None:
+        if self._in_flight < self.max_in_flight:
+            return
+        # Stop the background fetcher from buffering more records while the
+        # workers catch up, then resume once half the backlog has drained.
+        self.consumer.pause(*self.consumer.assignment())
+        self.stats.pauses += 1
+        try:
+            while self._pending and self._in_flight > self.max_in_flight // 2:
+                await asyncio.wait({self._pending[0][0]})
+                await self._commit_finished()
+        finally:
+            self.consumer.resume(*self.consumer.paused())
+
+    def _report(self) -> None:
+        if time.monotonic() - self._last_report < settings.KAFKA_CONSUMER_STATS_INTERVAL_SECONDS:
+            return
+        self._last_report = time.monotonic()
+        print(f"Consumer stats: {self.stats.snapshot(self.consumer)}")
+
+    async def run(self) -> None:
+        await self.consumer.start()
+        try:
+            while True:
+                batch = await self.consumer.getmany(timeout_ms=1000, max_records=self.max_records)
+                if batch:
+                    self._dispatch(batch)
+                await self._commit_finished()
+                await self._apply_backpressure()
+                self._report()
+        finally:
+            for task in list(self._lanes.values()):
+                task.cancel()
+            await self.consumer.stop()
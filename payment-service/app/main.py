@@ -91,12 +91,16 @@
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 from fastapi.responses import JSONResponse
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import FastAPI, Depends, HTTPException, Request
-from app.models import Payment
-from app.db_engine import create_db_and_tables, get_session
-from app.kafka import consume_messages, get_kafka_producer
+from app.models import CheckoutPayment, Payment
+from app.db_engine import get_pool_stats, get_read_session, get_session
+from app.pagination import PageParams, paginate
+from app.kafka import consume_messages, get_kafka_producer, start_kafka_producer, stop_kafka_producer
 from stripe import PaymentIntent, StripeError, stripe
+from app.auth import require_token
+from app.checkout import SETTLING_EVENTS, handle_payment_command, read_client_secret, settle_payment  # noqa: F401  registers the saga handler
 from app import settings
 import asyncio
 import json
@@ -109,12 +113,14 @@ endpoint_secret = settings.STRIPE_ENDPOINT_SECRET
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    print("Creating tables..")
-    await asyncio.to_thread(create_db_and_tables)
+    await start_kafka_producer()
     task = asyncio.create_task(consume_messages(
         settings.KAFKA_PAYMENT_TOPIC, settings.BOOTSTRAP_SERVER))
+    commands = asyncio.create_task(consume_messages(settings.CHECKOUT_PAYMENT_TOPIC, settings.BOOTSTRAP_SERVER))
     yield
     task.cancel()
+    commands.cancel()
+    await stop_kafka_producer()
 app = FastAPI(lifespan=lifespan, title="Payment Service", version="0.0.1",
               description="The Payment Service API processes payments and manages transaction records. It provides endpoints for handling payment transactions, recording payment details, and ensuring secure financial operations. This service integrates with other services to manage transaction data and ensure accurate financial processing.")
 
@@ -124,19 +130,26 @@ def read_root():
     return {"Hello": "Payment Service"}
 
 
-@app.post("/payments/stripe/", response_model=Payment)
-async def create_payment_stripe(amount: int, session: Session = Depends(get_session),
+@app.get("/db/pool")
+def read_pool_stats():
+    return get_pool_stats()
+
+
+@app.post("/payments/stripe/", response_model=Payment, dependencies=[Depends(require_token)])
+async def create_payment_stripe(amount: int, session: AsyncSession = Depends(get_session),
                                 producer=Depends(get_kafka_producer)):
     try:
-        payment_intent = stripe.PaymentIntent.create(
+        # The Stripe SDK is blocking, keep it off the event loop.
+        payment_intent = await asyncio.to_thread(
+            stripe.PaymentIntent.create,
             amount=amount,
             currency="usd",
             payment_method_types=["card"]
         )
         payment = Payment(amount=amount, payment_method="Stripe")
         session.add(payment)
-        session.commit()
-        session.refresh(payment)
+        await session.commit()
+        await session.refresh(payment)
         return payment
     except StripeError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -156,29 +169,50 @@ async def webhook(request: Request):
     except stripe.error.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    if event['type'] == 'payment_intent.succeeded':
+    if event['type'] in SETTLING_EVENTS:
+        payment_intent = event['data']['object']
+        if not await settle_payment(payment_intent, event['type']):
+            # The charge command hasn't committed its payment yet; Stripe retries.
+            raise HTTPException(status_code=409, detail="Payment not recorded yet")
+    elif event['type'] == 'payment_intent.payment_failed':
         payment_intent = event['data']['object']
-        print('PaymentIntent was successful!')
+        error = payment_intent.get('last_payment_error') or {}
+        # Not final: the customer can still confirm the intent with another card.
+        print(f"Payment attempt {payment_intent['id']} failed: {error.get('message')}")
     else:
         print(f'Unhandled event type {event["type"]}')
 
     return JSONResponse(content={'success': True})
 
 
-@app.get("/payments/", response_model=list[Payment])
-def read_payments(session: Session = Depends(get_session)):
+@app.get("/payments/", response_model=list[Payment], dependencies=[Depends(require_token)])
+async def read_payments(session: AsyncSession = Depends(get_read_session), page: PageParams = Depends()):
     try:
-        payments = session.exec(select(Payment)).all()
-        return payments
+        return await paginate(session, Payment, page)
     except HTTPException as e:
         raise e
 
 
-@app.get("/payments/{payment_id}", response_model=Payment)
-def read_payment(payment_id: int, session: Session = Depends(get_session)):
+@app.get("/payments/by-order/{order_id}", response_model=CheckoutPayment, dependencies=[Depends(require_token)])
+async def read_checkout_payment(order_id: int, session: AsyncSession = Depends(get_session)):
+    # Polled by the storefront right after checkout, so it reads the primary.
+    try:
+        payment = await read_client_secret(session, order_id)
+        if payment is None:
+            # The charge command may not have arrived yet; retry shortly.
+            raise HTTPException(status_code=404, detail="Payment not found", headers={"Retry-After": "1"})
+        return payment
+    except HTTPException as e:
+        raise e
+    except StripeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+
+@app.get("/payments/{payment_id}", response_model=Payment, dependencies=[Depends(require_token)])
+async def read_payment(payment_id: int, session: AsyncSession = Depends(get_read_session)):
     try:
-        payment = session.exec(select(Payment).filter(
-            Payment.id == payment_id)).first()
+        payment = (await session.exec(select(Payment).filter(
+            Payment.id == payment_id))).first()
         if payment is None:
             raise HTTPException(status_code=404, detail="Payment not found")
         return payment
@@ -8,5 +8,17 @@ class Payment(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     amount: float
     payment_method: str
+    # Set for payments taken by the checkout saga; one per order.
+    order_id: Optional[int] = Field(default=None, unique=True, index=True)
+    # pending until Stripe settles the intent: paid or failed, then
+    # refunded or cancelled if the checkout is undone.
+    status: Optional[str] = None
+    provider_reference: Optional[str] = None
 
 
+class CheckoutPayment(SQLModel):
+    order_id: int
+    amount: float
+    status: str
+    # Set while the payment waits for the customer to confirm it.
+    client_secret: Optional[str] = None
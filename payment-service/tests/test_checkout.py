@@ -0,0 +1,153 @@
+import asyncio
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app import checkout
+from app.db_engine import get_session
+from app.main import app
+from app.models import Payment
+
+COMMAND = {"order_id": 1, "amount": 20.0}
+
+
+class FakeResult:
+    def __init__(self, row) -> None:
+        self.row = row
+
+    def first(self):
+        return self.row
+
+
+class FakeSession:
+    # The payment row for order 1, as Postgres would hold it.
+    def __init__(self) -> None:
+        self.payment: Payment | None = None
+
+    async def exec(self, statement) -> FakeResult:
+        return FakeResult(self.payment)
+
+    def add(self, obj) -> None:
+        self.payment = obj
+
+    async def commit(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+
+def stripe_calls(monkeypatch) -> list[str]:
+    calls = []
+
+    def create(**kwargs):
+        calls.append("create")
+        return SimpleNamespace(id="pi_1", status="requires_payment_method")
+
+    def cancel(intent_id, **kwargs):
+        calls.append("cancel")
+
+    def refund(**kwargs):
+        calls.append("refund")
+
+    monkeypatch.setattr(checkout.stripe.PaymentIntent, "create", create)
+    monkeypatch.setattr(checkout.stripe.PaymentIntent, "cancel", cancel)
+    monkeypatch.setattr(checkout.stripe.Refund, "create", refund)
+    return calls
+
+
+def replies(monkeypatch, session: FakeSession) -> list[tuple]:
+    sent = []
+
+    async def send_reply(*args):
+        sent.append(args)
+
+    monkeypatch.setattr(checkout, "send_reply", send_reply)
+    monkeypatch.setattr(checkout, "AsyncSession", lambda *args, **kwargs: session)
+    return sent
+
+
+def test_charge_stays_pending_until_stripe_settles(monkeypatch)->None:
+    calls = stripe_calls(monkeypatch)
+    session = FakeSession()
+    sent = replies(monkeypatch, session)
+
+    assert asyncio.run(checkout.charge(session, COMMAND)) is None
+    assert session.payment.status == "pending"
+    # Redelivered while pending: no second intent and still no answer.
+    assert asyncio.run(checkout.charge(session, COMMAND)) is None
+    assert calls == ["create"]
+
+    intent = {"id": "pi_1", "metadata": {"order_id": "1"}}
+    assert asyncio.run(checkout.settle_payment(intent, "payment_intent.succeeded"))
+    assert asyncio.run(checkout.settle_payment(intent, "payment_intent.succeeded"))
+    assert session.payment.status == "paid"
+    assert sent == [(1, "charge", True, "")]
+    assert asyncio.run(checkout.charge(session, COMMAND)) == (True, "")
+
+
+def test_cancelled_intent_replies_failure(monkeypatch)->None:
+    stripe_calls(monkeypatch)
+    session = FakeSession()
+    sent = replies(monkeypatch, session)
+    asyncio.run(checkout.charge(session, COMMAND))
+
+    intent = {"id": "pi_1", "metadata": {"order_id": "1"}}
+    assert asyncio.run(checkout.settle_payment(intent, "payment_intent.canceled"))
+    assert sent == [(1, "charge", False, "payment failed")]
+    assert asyncio.run(checkout.charge(session, COMMAND)) == (False, "payment failed")
+
+
+def test_customer_confirms_through_storefront_and_webhook(monkeypatch)->None:
+    stripe_calls(monkeypatch)
+    session = FakeSession()
+    sent = replies(monkeypatch, session)
+    monkeypatch.setattr(checkout.stripe.PaymentIntent, "retrieve",
+                        lambda intent_id: SimpleNamespace(client_secret=f"{intent_id}_secret"))
+    asyncio.run(checkout.charge(session, COMMAND))
+
+    async def override_session():
+        yield session
+
+    app.dependency_overrides[get_session] = override_session
+    client = TestClient(app)
+    try:
+        # The storefront gets the client_secret to confirm the intent with.
+        response = client.get("/payments/by-order/1")
+        assert response.json() == {"order_id": 1, "amount": 20.0, "status": "pending",
+                                   "client_secret": "pi_1_secret"}
+
+        events = iter([
+            {"type": "payment_intent.payment_failed",
+             "data": {"object": {"id": "pi_1", "metadata": {"order_id": "1"},
+                                 "last_payment_error": {"message": "card declined"}}}},
+            {"type": "payment_intent.succeeded",
+             "data": {"object": {"id": "pi_1", "metadata": {"order_id": "1"}}}},
+        ])
+        monkeypatch.setattr(checkout.stripe.Webhook, "construct_event", lambda *args: next(events))
+        # A declined card leaves the intent open for another try.
+        assert client.post("/webhooks/stripe", content=b"{}").status_code == 200
+        assert sent == [] and session.payment.status == "pending"
+        assert client.post("/webhooks/stripe", content=b"{}").status_code == 200
+        assert sent == [(1, "charge", True, "")]
+        assert client.get("/payments/by-order/1").json()["client_secret"] is None
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_refund_cancels_pending_and_refunds_paid_once(monkeypatch)->None:
+    calls = stripe_calls(monkeypatch)
+    session = FakeSession()
+    asyncio.run(checkout.charge(session, COMMAND))
+    asyncio.run(checkout.refund(session, COMMAND))
+    asyncio.run(checkout.refund(session, COMMAND))
+    assert session.payment.status == "cancelled"
+
+    session.payment.status = "paid"
+    asyncio.run(checkout.refund(session, COMMAND))
+    asyncio.run(checkout.refund(session, COMMAND))
+    assert session.payment.status == "refunded"
+    assert calls == ["create", "cancel", "refund"]
@@ -0,0 +1,59 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises: None
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.schema import CreateTable
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+metadata = sa.MetaData()
+
+
+# Databases created before migrations already have these tables from
+# SQLModel.metadata.create_all, and some tables are shared with other services
+# in the same database, so only create what is missing.
+def create_missing_table(name: str, *columns: sa.Column) -> None:
+    table = sa.Table(name, metadata, *columns, sa.PrimaryKeyConstraint("id"))
+    op.execute(CreateTable(table, if_not_exists=True))
+
+
+def upgrade() -> None:
+    create_missing_table(
+        "product",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("description", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+    )
+    create_missing_table(
+        "outboxevent",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("topic", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("key", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("payload", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("published_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_outboxevent_published_at", "outboxevent", ["published_at"], if_not_exists=True)
+    op.create_index("ix_outboxevent_unpublished", "outboxevent", ["id"],
+                    postgresql_where=sa.text("published_at IS NULL"), if_not_exists=True)
+
+
+def downgrade() -> None:
+    # The baseline adopts tables that may predate it or belong to another
+    # service as well, so it never drops them.
+    pass
@@ -0,0 +1,141 @@
+#bulk.py
+import codecs
+import csv
+import json
+from datetime import datetime
+from typing import Any, AsyncGenerator
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import settings
+from app.events import encode_event
+from app.models import OutboxEvent, Product, ProductBase
+
+Row = tuple[int, dict[str, Any] | str]  # (row number, parsed row or parse error)
+
+
+async def _iter_lines(request: Request) -> AsyncGenerator[str, None]:
+    # Chunks can end in the middle of a multibyte character; the incremental
+    # decoder holds those bytes back until the rest arrives.
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    try:
+        async for chunk in request.stream():
+            buffer += decoder.decode(chunk)
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                yield line
+        buffer += decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Body is not valid UTF-8: {e}")
+    if buffer:
+        yield buffer
+
+
+async def _iter_ndjson(request: Request) -> AsyncGenerator[Row, None]:
+    index = 0
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        try:
+            yield index, json.loads(line)
+        except ValueError as e:
+            yield index, f"Invalid JSON: {e}"
+        index += 1
+
+
+async def _iter_csv(request: Request) -> AsyncGenerator[Row, None]:
+    header: list[str] | None = None
+    record = ""
+    index = 0
+    async for line in _iter_lines(request):
+        # A quoted field may contain newlines; keep joining lines until the
+        # quotes balance before handing the record to the csv module.
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        if record.strip():
+            values = next(csv.reader([record]))
+            if header is None:
+                header = values
+            else:
+                yield index, dict(zip(header, values))
+                index += 1
+        record = ""
+
+
+async def iter_bulk_rows(request: Request) -> AsyncGenerator[Row, None]:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "text/csv":
+        async for row in _iter_csv(request):
+            yield row
+    elif content_type in ("application/x-ndjson", "application/jsonl"):
+        async for row in _iter_ndjson(request):
+            yield row
+    elif content_type == "application/json":
+        try:
+            items = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of products")
+        for index, item in enumerate(items):
+            yield index, item
+    else:
+        raise HTTPException(status_code=415, detail="Send application/json, application/x-ndjson or text/csv")
+
+
+async def insert_products(session: AsyncSession, rows: list[dict[str, Any]]) -> list[int]:
+    # One multi-row INSERT ... RETURNING for the products and one for their
+    # outbox events, committed together.
+    product_table = Product.__table__
+    result = await session.exec(
+        insert(product_table).returning(product_table.c.id, sort_by_parameter_order=True),
+        params=rows,
+    )
+    ids = list(result.scalars())
+
+    now = datetime.utcnow()
+    events = [
+        {"topic": "products", "key": str(product_id), "created_at": now,
+         "payload": encode_event("product", {"id": product_id, **row}, settings.EVENT_ENCODING)}
+        for product_id, row in zip(ids, rows)
+    ]
+    await session.exec(insert(OutboxEvent.__table__), params=events)
+    await session.commit()
+    return ids
+
+
+async def ingest_products(session: AsyncSession, request: Request) -> dict[str, Any]:
+    inserted = 0
+    errors: list[dict[str, Any]] = []
+    chunk: list[tuple[int, dict[str, Any]]] = []
+
+    async def flush() -> None:
+        nonlocal inserted
+        try:
+            inserted += len(await insert_products(session, [row for _, row in chunk]))
+        except Exception as e:
+            await session.rollback()
+            errors.extend({"row": index, "error": f"Insert failed: {e}"} for index, _ in chunk)
+        chunk.clear()
+
+    async for index, row in iter_bulk_rows(request):
+        if isinstance(row, str):
+            errors.append({"row": index, "error": row})
+            continue
+        try:
+            product = ProductBase.model_validate(row)
+        except ValidationError as e:
+            errors.append({"row": index, "error": str(e)})
+            continue
+        chunk.append((index, product.model_dump()))
+        if len(chunk) >= settings.BULK_INSERT_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+
+    return {"inserted": inserted, "failed": len(errors), "errors": errors}
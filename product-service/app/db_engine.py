@@ -1,7 +1,13 @@
 #db_engine.py
-from app import settings
-from sqlmodel import create_engine, SQLModel , Session
+import time
+
+from fastapi import Request, Response
 
+from app import settings
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 # only needed for psycopg 3 - replace postgresql
 # with postgresql+psycopg in settings.DATABASE_URL
@@ -9,17 +15,139 @@ connection_string = str(settings.DATABASE_URL).replace(
     "postgresql", "postgresql+psycopg"
 )
 
+# Checkout counters for the pool, served from /db/pool to help size it.
+pool_stats = {"checkouts": 0, "overflow_checkouts": 0, "timeouts": 0,
+              "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats["timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            pool_stats["wait_seconds_total"] += waited
+            pool_stats["wait_seconds_max"] = max(pool_stats["wait_seconds_max"], waited)
+        pool_stats["checkouts"] += 1
+        if self.checkedout() > self.size():
+            pool_stats["overflow_checkouts"] += 1
+        return connection
 
-engine = create_engine(
-    connection_string, connect_args={}, pool_recycle=300
+
+connect_args = {}
+if settings.DB_STATEMENT_TIMEOUT_MS:
+    connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+
+# psycopg 3 speaks asyncio natively, so the same URL drives the async engine
+# and database round trips no longer block the event loop.
+engine = create_async_engine(
+    connection_string,
+    connect_args=connect_args,
+    poolclass=InstrumentedPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
 )
 
 
-def create_db_and_tables()->None:
-    SQLModel.metadata.create_all(engine)
+# Optional read replica. Read-only routes take get_read_session, which falls
+# back to the primary while the replica is unreachable, and for clients that
+# wrote within the last DB_REPLICA_STICKY_SECONDS so they see their own writes.
+replica_engine = None
+if str(settings.DATABASE_REPLICA_URL):
+    replica_engine = create_async_engine(
+        str(settings.DATABASE_REPLICA_URL).replace("postgresql", "postgresql+psycopg"),
+        connect_args=connect_args,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+# Set on responses to writes; holds the time until which reads stay on the primary.
+STICKY_COOKIE = "db-primary-until"
+
+replica_stats = {"replica_reads": 0, "sticky_reads": 0, "fallback_reads": 0,
+                 "failures": 0, "unhealthy_until": 0.0}
+
 
-def get_session():
-    with Session(engine) as session:
+def get_pool_stats() -> dict:
+    pool = engine.pool
+    checkouts = pool_stats["checkouts"]
+    stats = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        **pool_stats,
+        "wait_seconds_avg": pool_stats["wait_seconds_total"] / checkouts if checkouts else 0.0,
+    }
+    if replica_engine is not None:
+        replica_pool = replica_engine.pool
+        stats["replica"] = {
+            "size": replica_pool.size(),
+            "checked_out": replica_pool.checkedout(),
+            "checked_in": replica_pool.checkedin(),
+            "overflow": replica_pool.overflow(),
+            **replica_stats,
+        }
+    return stats
+
+
+def _mark_replica_unhealthy(error: Exception) -> None:
+    print(f"Read replica unavailable, using the primary: {error}")
+    replica_stats["failures"] += 1
+    replica_stats["unhealthy_until"] = time.time() + settings.DB_REPLICA_RETRY_SECONDS
+
+
+def _is_sticky(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+# expire_on_commit=False keeps committed objects readable without a lazy
+# reload, which an async session can't do implicitly.
+async def get_session(request: Request, response: Response):
+    if replica_engine is not None and request.method not in ("GET", "HEAD", "OPTIONS"):
+        until = time.time() + settings.DB_REPLICA_STICKY_SECONDS
+        response.set_cookie(STICKY_COOKIE, f"{until:.3f}",
+                            max_age=int(settings.DB_REPLICA_STICKY_SECONDS) + 1, httponly=True)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
 
 
+async def get_read_session(request: Request):
+    if replica_engine is None:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+        return
+
+    if _is_sticky(request):
+        replica_stats["sticky_reads"] += 1
+    elif time.time() >= replica_stats["unhealthy_until"]:
+        async with AsyncSession(replica_engine, expire_on_commit=False) as session:
+            try:
+                # Check out a connection up front so an unreachable replica is
+                # caught here, while the request can still go to the primary.
+                await session.connection()
+            except (exc.DBAPIError, exc.TimeoutError) as e:
+                _mark_replica_unhealthy(e)
+            else:
+                replica_stats["replica_reads"] += 1
+                yield session
+                return
+    else:
+        replica_stats["fallback_reads"] += 1
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
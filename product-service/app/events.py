@@ -0,0 +1,183 @@
+#events.py
+import json
+import struct
+from dataclasses import dataclass
+from typing import Any
+
+# Binary events start with this byte; JSON events always start with "{".
+MAGIC = 0xEC
+_HEADER = struct.Struct(">BHB")  # magic, schema id, schema version
+_DOUBLE = struct.Struct("<d")
+
+# Avro-style schemas: fields are written positionally, so only the values go on
+# the wire. Never change a published version, add a new one instead; readers
+# keep every version that may still be sitting on a topic. A "?" suffix marks a
+# field that may be None; "int[]" is a list of ints.
+SCHEMAS: dict[str, dict[int, tuple[tuple[str, str], ...]]] = {
+    "product": {
+        1: (("id", "int?"), ("name", "str"), ("description", "str"),
+            ("price", "float"), ("quantity", "int")),
+    },
+    "inventory": {
+        1: (("id", "int?"), ("name", "str"), ("description", "str"),
+            ("price", "float"), ("quantity", "int")),
+    },
+    "order": {
+        1: (("id", "int?"), ("user_id", "int"), ("products", "int"),
+            ("total_amount", "float")),
+        # products is only set on orders placed before order lines; newer
+        # orders carry item_count instead.
+        2: (("id", "int?"), ("user_id", "int"), ("products", "int?"),
+            ("item_count", "int?"), ("total_amount", "float")),
+    },
+    "payment": {
+        1: (("id", "int?"), ("amount", "float"), ("payment_method", "str")),
+    },
+    "user": {
+        1: (("id", "int?"), ("user_name", "str"), ("user_email", "str"),
+            ("address", "str"), ("phone_number", "int")),
+    },
+    "revocation": {
+        1: (("jti", "str"), ("expires_at", "int")),
+    },
+    # Checkout saga: commands from order-service to inventory and payment, and
+    # their replies. The action says which step ("reserve", "charge", ...).
+    "checkout_command": {
+        1: (("order_id", "int"), ("action", "str"), ("product_ids", "int[]"),
+            ("quantities", "int[]"), ("amount", "float")),
+    },
+    "checkout_reply": {
+        1: (("order_id", "int"), ("action", "str"), ("ok", "bool"), ("reason", "str")),
+    },
+    "order_status": {
+        1: (("id", "int"), ("user_id", "int"), ("status", "str"), ("total_amount", "float")),
+    },
+}
+SCHEMA_IDS = {"product": 1, "inventory": 2, "order": 3, "payment": 4, "user": 5, "revocation": 6,
+              "checkout_command": 7, "checkout_reply": 8, "order_status": 9}
+_SCHEMA_NAMES = {schema_id: name for name, schema_id in SCHEMA_IDS.items()}
+
+
+@dataclass
+class Event:
+    type: str
+    version: int
+    data: dict[str, Any]
+
+
+class EventDecodeError(ValueError):
+    pass
+
+
+def _write_varint(buf: bytearray, value: int) -> None:
+    while value > 0x7F:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _read_varint(raw: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = raw[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_value(buf: bytearray, kind: str, value: Any) -> None:
+    if kind.endswith("?"):
+        if value is None:
+            buf.append(0)
+            return
+        buf.append(1)
+        kind = kind[:-1]
+    if kind == "int":
+        _write_varint(buf, (value << 1) ^ (value >> 63))  # zigzag
+    elif kind == "float":
+        buf += _DOUBLE.pack(value)
+    elif kind == "str":
+        encoded = value.encode("utf-8")
+        _write_varint(buf, len(encoded))
+        buf += encoded
+    elif kind == "bool":
+        buf.append(1 if value else 0)
+    elif kind == "int[]":
+        _write_varint(buf, len(value))
+        for item in value:
+            _write_varint(buf, (item << 1) ^ (item >> 63))
+    else:
+        raise ValueError(f"Unknown field kind {kind!r}")
+
+
+def _read_value(raw: bytes, pos: int, kind: str) -> tuple[Any, int]:
+    if kind.endswith("?"):
+        present = raw[pos]
+        pos += 1
+        if not present:
+            return None, pos
+        kind = kind[:-1]
+    if kind == "int":
+        value, pos = _read_varint(raw, pos)
+        return (value >> 1) ^ -(value & 1), pos
+    if kind == "float":
+        return _DOUBLE.unpack_from(raw, pos)[0], pos + _DOUBLE.size
+    if kind == "str":
+        length, pos = _read_varint(raw, pos)
+        return raw[pos:pos + length].decode("utf-8"), pos + length
+    if kind == "bool":
+        return raw[pos] == 1, pos + 1
+    if kind == "int[]":
+        count, pos = _read_varint(raw, pos)
+        items = []
+        for _ in range(count):
+            value, pos = _read_varint(raw, pos)
+            items.append((value >> 1) ^ -(value & 1))
+        return items, pos
+    raise EventDecodeError(f"Unknown field kind {kind!r}")
+
+
+def encode_event(event_type: str, data: dict[str, Any], encoding: str = "binary") -> bytes:
+    versions = SCHEMAS[event_type]
+    version = max(versions)
+    if encoding == "json":
+        return json.dumps({"type": event_type, "version": version, "data": data},
+                          separators=(",", ":")).encode("utf-8")
+
+    buf = bytearray(_HEADER.pack(MAGIC, SCHEMA_IDS[event_type], version))
+    for name, kind in versions[version]:
+        try:
+            _write_value(buf, kind, data[name])
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Cannot encode {event_type}.{name}: {e}") from e
+    return bytes(buf)
+
+
+def decode_event(raw: bytes) -> Event:
+    if raw[:1] != bytes((MAGIC,)):
+        try:
+            message = json.loads(raw)
+        except ValueError as e:
+            raise EventDecodeError(f"Not a binary or JSON event: {e}") from e
+        if isinstance(message, dict) and "type" in message and "data" in message:
+            return Event(message["type"], message.get("version", 1), message["data"])
+        # Plain dicts published before events carried an envelope.
+        return Event("unknown", 0, message)
+
+    try:
+        _, schema_id, version = _HEADER.unpack_from(raw)
+        event_type = _SCHEMA_NAMES[schema_id]
+        fields = SCHEMAS[event_type][version]
+    except (struct.error, KeyError) as e:
+        raise EventDecodeError(f"Unknown event schema: {e}") from e
+
+    data = {}
+    pos = _HEADER.size
+    try:
+        for name, kind in fields:
+            data[name], pos = _read_value(raw, pos, kind)
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise EventDecodeError(f"Truncated {event_type} event: {e}") from e
+    return Event(event_type, version, data)
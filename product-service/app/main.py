@@ -1,25 +1,61 @@
 from contextlib import asynccontextmanager
 from typing import Annotated
-from sqlmodel import Session, select
-from fastapi import FastAPI, Depends, HTTPException
+import time
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi import FastAPI, Depends, HTTPException, Request
 from typing import AsyncGenerator
-from aiokafka import AIOKafkaProducer
+from sqlalchemy import select
 import asyncio
-import json
 
 from app.models import Product
-from app.db_engine import create_db_and_tables, get_session
-from app.kafka import consume_messages, get_kafka_producer
+from app.db_engine import engine, get_pool_stats, get_read_session, get_session, replica_engine
+from app.kafka import consume_cache_invalidations, consume_messages, start_kafka_producer, stop_kafka_producer
+from app.outbox import add_outbox_event, relay_stats, run_outbox_relay
+from app.bulk import ingest_products
+from app.cache import TTLCache
+from app.pagination import PageParams, conditional_response, fetch_page, render_page
 from app import settings
 
+product_cache = TTLCache(settings.PRODUCT_CACHE_MAX_ENTRIES, settings.PRODUCT_CACHE_TTL_SECONDS)
+page_cache = TTLCache(settings.PRODUCT_PAGE_CACHE_MAX_ENTRIES, settings.PRODUCT_CACHE_TTL_SECONDS)
+# Right after an invalidation the replica may still hold the old row, and a
+# load from it would be cached for the whole TTL. Until this time cache
+# loads read from the primary instead.
+cache_primary_until = 0.0
+
+
+def invalidate_product(product_id: int | None) -> None:
+    global cache_primary_until
+    # Any change can move rows in or out of a listing page, so pages go too.
+    if product_id is None:
+        product_cache.clear()
+    else:
+        product_cache.invalidate(product_id)
+    page_cache.clear()
+    cache_primary_until = time.time() + settings.DB_REPLICA_STICKY_SECONDS
+
+
+@asynccontextmanager
+async def cache_load_session(read_session: AsyncSession) -> AsyncGenerator[AsyncSession, None]:
+    if replica_engine is None or time.time() >= cache_primary_until:
+        yield read_session
+        return
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    print("Creating tables..")
-    create_db_and_tables()
+    producer = await start_kafka_producer()
+    relay = asyncio.create_task(run_outbox_relay(producer))
     task = asyncio.create_task(consume_messages('products', settings.BOOTSTRAP_SERVER))
+    invalidator = asyncio.create_task(
+        consume_cache_invalidations(['products', 'inventory'], settings.BOOTSTRAP_SERVER, invalidate_product))
     yield
     task.cancel()
+    invalidator.cancel()
+    relay.cancel()
+    await stop_kafka_producer()
 
 app = FastAPI(lifespan=lifespan, title="Product Service", version="0.0.1", description="The Product Service API manages the product catalog, including CRUD operations for products. It provides endpoints for adding, updating, retrieving, and deleting product information. This service ensures the organization and maintenance of product data, allowing for seamless product management and integration with other services in the system.")
 
@@ -27,49 +63,101 @@ app = FastAPI(lifespan=lifespan, title="Product Service", version="0.0.1", descr
 def read_root():
     return {"Hello": "Product Service"}
 
+@app.get("/db/pool")
+def read_pool_stats():
+    return get_pool_stats()
+
+@app.get("/outbox/stats")
+def read_outbox_stats():
+    return relay_stats
+
+@app.get("/cache/stats")
+def read_cache_stats():
+    return {"products": product_cache.stats(), "pages": page_cache.stats()}
+
 @app.post("/products/", response_model=Product)
 async def create_new_product(
     product: Product,
-    session: Annotated[Session, Depends(get_session)],
-    producer: Annotated[AIOKafkaProducer, Depends(get_kafka_producer)]
+    session: Annotated[AsyncSession, Depends(get_session)]
 ) -> Product:
     try:
-        product_dict = {field: getattr(product, field) for field in product.dict()}
-        product_json = json.dumps(product_dict).encode("utf-8")
-        await producer.send_and_wait("products", product_json)
         session.add(product)
-        session.commit()
-        session.refresh(product)
+        await session.flush()
+        product_dict = {field: getattr(product, field) for field in product.dict()}
+        add_outbox_event(session, "products", "product", product_dict, key=str(product.id))
+        await session.commit()
+        invalidate_product(product.id)
+        await session.refresh(product)
         return product
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/products/bulk")
+async def create_products_bulk(
+    request: Request,
+    session: Annotated[AsyncSession, Depends(get_session)]
+):
+    # Accepts a JSON array, or a streamed NDJSON / CSV body (with a header
+    # row), inserted in chunks of BULK_INSERT_CHUNK_SIZE. Rows that fail are
+    # reported by position and don't stop the rest.
+    try:
+        result = await ingest_products(session, request)
+        if result["inserted"]:
+            invalidate_product(None)
+        return result
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/products/", response_model=list[Product])
-def read_products(session: Annotated[Session, Depends(get_session)]):
+async def read_products(
+    request: Request,
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+    page: Annotated[PageParams, Depends()]
+):
+    async def load():
+        async with cache_load_session(session) as load_session:
+            return render_page(*await fetch_page(load_session, Product, page))
+
     try:
-        products = session.exec(select(Product)).all()
-        return products
+        # Pages are cached already rendered with their ETag, so an unchanged
+        # poll is answered from memory with a 304 and no query.
+        key = (page.limit, page.after, tuple(page.fields) if page.fields else None)
+        body, headers = await page_cache.get_or_load(key, load)
+        return conditional_response(request, body, headers)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/products/{product_id}", response_model=Product)
-def read_product_by_id(product_id: int, session: Annotated[Session, Depends(get_session)]):
+async def read_product_by_id(product_id: int, session: Annotated[AsyncSession, Depends(get_read_session)]):
+    async def load():
+        statement = select(Product.__table__).where(Product.id == product_id)
+        async with cache_load_session(session) as load_session:
+            row = (await load_session.exec(statement)).mappings().first()
+        return dict(row) if row else None
+
     try:
-        product = session.get(Product, product_id)
+        # Misses are cached too (as None) until a create invalidates them.
+        product = await product_cache.get_or_load(product_id, load)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         return product
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/products/{product_id}", response_model=Product)
-def update_product(
+async def update_product(
     product_id: int, 
     updated_product: Product, 
-    session: Annotated[Session, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(get_session)]
 ) -> Product:
     try:
-        product = session.get(Product, product_id)
+        product = await session.get(Product, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
@@ -78,21 +166,31 @@ def update_product(
             setattr(product, key, value)
         
         session.add(product)
-        session.commit()
-        session.refresh(product)
+        product_dict = {field: getattr(product, field) for field in product.dict()}
+        add_outbox_event(session, "products", "product", product_dict, key=str(product_id))
+        await session.commit()
+        invalidate_product(product_id)
+        await session.refresh(product)
         return product
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/products/{product_id}")
-def delete_product(product_id: int, session: Annotated[Session, Depends(get_session)]):
+async def delete_product(product_id: int, session: Annotated[AsyncSession, Depends(get_session)]):
     try:
-        product = session.get(Product, product_id)
+        product = await session.get(Product, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        session.delete(product)
-        session.commit()
+        product_dict = {field: getattr(product, field) for field in product.dict()}
+        await session.delete(product)
+        add_outbox_event(session, "products", "product", product_dict, key=str(product_id))
+        await session.commit()
+        invalidate_product(product_id)
         return {"detail": "Product deleted"}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
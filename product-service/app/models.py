@@ -1,9 +1,30 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Index, LargeBinary, text
 from typing import Optional
+from datetime import datetime
 
-class Product(SQLModel, table=True):
-    id: Optional[int] = Field(default=None, primary_key=True)
-    name: str
+class ProductBase(SQLModel):
+    name: str = Field(index=True)
     description: str
-    price: float
+    price: float = Field(index=True)
     quantity: int
+
+
+class Product(ProductBase, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+
+class OutboxEvent(SQLModel, table=True):
+    # Events are written in the same transaction as the entity they describe
+    # and published to Kafka afterwards by the outbox relay.
+    __table_args__ = (
+        Index("ix_outboxevent_unpublished", "id",
+              postgresql_where=text("published_at IS NULL")),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    topic: str
+    key: Optional[str] = None
+    payload: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    published_at: Optional[datetime] = Field(default=None, index=True)
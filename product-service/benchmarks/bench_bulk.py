@@ -0,0 +1,65 @@
+#bench_bulk.py
+#
+# Rows/sec of POST /products/bulk against the single-item POST /products/ path,
+# on a running product service.
+#
+#   poetry run python -m benchmarks.bench_bulk --url http://localhost:8083 --rows 20000
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+def product_row(i: int) -> dict:
+    return {"name": f"bulk-{i}", "description": "bulk ingestion benchmark",
+            "price": round(1 + i % 500 * 0.37, 2), "quantity": i % 1000}
+
+
+async def single_items(client: httpx.AsyncClient, rows: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(i: int) -> None:
+        async with semaphore:
+            (await client.post("/products/", json=product_row(i))).raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(post(i) for i in range(rows)))
+    return time.perf_counter() - start
+
+
+async def bulk(client: httpx.AsyncClient, rows: int) -> float:
+    async def body():
+        for i in range(rows):
+            yield (json.dumps(product_row(i)) + "\n").encode("utf-8")
+
+    start = time.perf_counter()
+    response = await client.post("/products/bulk", content=body(),
+                                  headers={"Content-Type": "application/x-ndjson"})
+    response.raise_for_status()
+    assert response.json()["failed"] == 0, response.json()["errors"][:5]
+    return time.perf_counter() - start
+
+
+async def run(args: argparse.Namespace) -> None:
+    async with httpx.AsyncClient(base_url=args.url, timeout=600) as client:
+        # The single-item path is far slower, so time it on a smaller sample.
+        single_rows = min(args.rows, args.single_rows)
+        elapsed = await single_items(client, single_rows, args.concurrency)
+        print(f"single  rows={single_rows:<7} {single_rows / elapsed:10.1f} rows/s")
+        elapsed = await bulk(client, args.rows)
+        print(f"bulk    rows={args.rows:<7} {args.rows / elapsed:10.1f} rows/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk vs single-item product ingestion")
+    parser.add_argument("--url", default="http://localhost:8083")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--single-rows", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#bench_events.py
+#
+# Encode/decode cost and payload size of the event codec against the plain
+# json.dumps path the services used before, on realistic events.
+#
+#   poetry run python -m benchmarks.bench_events
+import json
+import timeit
+
+from app.events import decode_event, encode_event
+
+EVENTS = {
+    "product": {"id": 18234, "name": "Stainless steel water bottle 750ml",
+                "description": "Double-walled, vacuum insulated, keeps drinks cold for 24 hours",
+                "price": 19.95, "quantity": 842},
+    "order": {"id": 99120, "user_id": 5521, "products": 3, "total_amount": 142.7},
+    "payment": {"id": 77310, "amount": 142.7, "payment_method": "Stripe"},
+}
+
+
+def per_call_us(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 50000) -> None:
+    print(f"{'event':<8} {'format':<7} {'bytes':>6} {'encode us':>10} {'decode us':>10}")
+    for event_type, data in EVENTS.items():
+        plain = json.dumps(data).encode("utf-8")
+        rows = [("json", plain,
+                 lambda: json.dumps(data).encode("utf-8"),
+                 lambda: json.loads(plain.decode()))]
+        for encoding in ("json", "binary"):
+            encoded = encode_event(event_type, data, encoding)
+            rows.append((f"{encoding}*", encoded,
+                         lambda e=encoding: encode_event(event_type, data, e),
+                         lambda raw=encoded: decode_event(raw)))
+        for label, payload, encode, decode in rows:
+            print(f"{event_type:<8} {label:<7} {len(payload):>6} "
+                  f"{per_call_us(encode, number):>10.2f} {per_call_us(decode, number):>10.2f}")
+    print("* = versioned envelope from app.events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#bench_producer.py
+#
+# Compares the old per-request producer (create, start, send, stop for every
+# event) with the shared, batched producer started once in the lifespan hook.
+#
+#   poetry run python benchmarks/bench_producer.py --bootstrap localhost:9092
+#
+# Pass --url to load-test a running service's POST /products/ instead, once on
+# the old build and once on the new one, and compare the printed numbers.
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+from aiokafka import AIOKafkaProducer
+
+TOPIC = "bench-products"
+
+
+def product_payload(i: int) -> dict:
+    return {"name": f"product-{i}", "description": "benchmark product",
+            "price": 9.99, "quantity": i % 100}
+
+
+def report(label: str, latencies: list[float], elapsed: float) -> None:
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:<12} n={len(latencies):<6} "
+          f"p50={statistics.median(latencies) * 1000:8.2f}ms "
+          f"p99={p99 * 1000:8.2f}ms "
+          f"throughput={len(latencies) / elapsed:9.1f} req/s")
+
+
+async def run_concurrently(n: int, concurrency: int, one) -> tuple[list[float], float]:
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await one(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(i) for i in range(n)))
+    return latencies, time.perf_counter() - start
+
+
+async def bench_kafka(args: argparse.Namespace) -> None:
+    async def per_request(i: int) -> None:
+        producer = AIOKafkaProducer(bootstrap_servers=args.bootstrap)
+        await producer.start()
+        try:
+            await producer.send_and_wait(TOPIC, json.dumps(product_payload(i)).encode("utf-8"))
+        finally:
+            await producer.stop()
+
+    report("per-request", *await run_concurrently(args.requests, args.concurrency, per_request))
+
+    shared = AIOKafkaProducer(
+        bootstrap_servers=args.bootstrap,
+        linger_ms=args.linger_ms,
+        max_batch_size=args.batch_size,
+        compression_type=args.compression or None,
+        acks="all",
+    )
+    await shared.start()
+    try:
+        async def shared_send(i: int) -> None:
+            await shared.send_and_wait(TOPIC, json.dumps(product_payload(i)).encode("utf-8"))
+
+        report("shared", *await run_concurrently(args.requests, args.concurrency, shared_send))
+    finally:
+        await shared.stop()
+
+
+async def bench_http(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        async def post(i: int) -> None:
+            response = await client.post("/products/", json=product_payload(i))
+            response.raise_for_status()
+
+        report("http", *await run_concurrently(args.requests, args.concurrency, post))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-request vs shared Kafka producer")
+    parser.add_argument("--bootstrap", default="localhost:9092")
+    parser.add_argument("--url", help="base URL of a running product service")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--linger-ms", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=65536)
+    parser.add_argument("--compression", default="")
+    args = parser.parse_args()
+    asyncio.run(bench_http(args) if args.url else bench_kafka(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#load_test.py
+#
+# Concurrent-request throughput against a single running worker. Start the
+# service with one worker, run this, then repeat on the build you compare with:
+#
+#   poetry run uvicorn app.main:app --port 8083 --workers 1
+#   poetry run python -m benchmarks.load_test --url http://localhost:8083 --path /products/1
+#   poetry run python -m benchmarks.load_test --url http://localhost:8083 --path /products/ --method POST
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def product_payload(i: int) -> dict:
+    return {"name": f"load-{i}", "description": "load test product",
+            "price": 4.5, "quantity": i % 50}
+
+
+async def run(args: argparse.Namespace) -> None:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        async def worker(worker_id: int) -> None:
+            nonlocal errors
+            i = worker_id
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                if args.method == "POST":
+                    response = await client.post(args.path, json=product_payload(i))
+                else:
+                    response = await client.get(args.path)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+                i += args.concurrency
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{args.method} {args.path} concurrency={args.concurrency} requests={len(latencies)} errors={errors}")
+    print(f"throughput={len(latencies) / elapsed:.1f} req/s "
+          f"p50={statistics.median(latencies) * 1000:.2f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent HTTP load test")
+    parser.add_argument("--url", default="http://localhost:8083")
+    parser.add_argument("--path", default="/products/")
+    parser.add_argument("--method", choices=["GET", "POST"], default="GET")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
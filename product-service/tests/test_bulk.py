@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.bulk import iter_bulk_rows
+
+
+class FakeRequest:
+    # Just enough of a Starlette request: a content type and a chunked body.
+    def __init__(self, content_type: str, chunks: list[bytes]) -> None:
+        self.headers = {"content-type": content_type}
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def rows(content_type: str, body: bytes, chunk_size: int) -> list:
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    async def collect():
+        return [row async for row in iter_bulk_rows(FakeRequest(content_type, chunks))]
+
+    return asyncio.run(collect())
+
+
+def test_ndjson_rows_and_errors()->None:
+    body = b'{"name": "Lamp", "price": 9.5}\n\nnot json\n{"name": "Desk"}'
+    parsed = rows("application/x-ndjson", body, chunk_size=7)
+    assert parsed[0] == (0, {"name": "Lamp", "price": 9.5})
+    assert parsed[1][0] == 1 and parsed[1][1].startswith("Invalid JSON")
+    assert parsed[2] == (2, {"name": "Desk"})
+
+
+def test_csv_with_quoted_newline()->None:
+    body = b'name,description\nLamp,"warm\nwhite"\nDesk,oak\n'
+    assert rows("text/csv", body, chunk_size=5) == [
+        (0, {"name": "Lamp", "description": "warm\nwhite"}),
+        (1, {"name": "Desk", "description": "oak"}),
+    ]
+
+
+@pytest.mark.parametrize("content_type, body", [
+    ("application/x-ndjson", '{"name": "Café crème ☕"}\n'.encode("utf-8")),
+    ("text/csv", "name\nCafé crème ☕\n".encode("utf-8")),
+])
+def test_multibyte_character_split_across_chunks(content_type: str, body: bytes)->None:
+    # One-byte chunks split every multibyte character.
+    parsed = rows(content_type, body, chunk_size=1)
+    assert parsed == [(0, {"name": "Café crème ☕"})]
+
+
+def test_invalid_utf8_is_rejected()->None:
+    with pytest.raises(HTTPException) as error:
+        rows("application/x-ndjson", b'{"name": "\xff"}\n', chunk_size=4)
+    assert error.value.status_code == 400
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from app import cache
+from app.cache import TTLCache
+
+
+def test_lru_eviction()->None:
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")
+    c.set("c", 3)
+    assert c.get("b") == (False, None)
+    assert c.get("a") == (True, 1)
+    assert c.evictions == 1
+
+
+def test_entries_expire(monkeypatch)->None:
+    now = 1000.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    c = TTLCache(maxsize=10, ttl=5)
+    c.set("a", 1)
+    now += 5
+    assert c.get("a") == (False, None)
+    assert c.expirations == 1
+
+
+def test_concurrent_misses_share_one_load()->None:
+    c = TTLCache(maxsize=10, ttl=60)
+    loads = 0
+
+    async def load():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        return await asyncio.gather(*(c.get_or_load("k", load) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["value"] * 10
+    assert loads == 1
+    assert (c.misses, c.coalesced) == (1, 9)
+    assert c.get("k") == (True, "value")
+
+
+def test_load_overlapping_invalidation_is_not_stored()->None:
+    c = TTLCache(maxsize=10, ttl=60)
+
+    async def load():
+        await asyncio.sleep(0)
+        c.invalidate("k")
+        return "stale"
+
+    assert asyncio.run(c.get_or_load("k", load)) == "stale"
+    assert c.get("k") == (False, None)
+
+
+def test_load_errors_reach_every_waiter()->None:
+    c = TTLCache(maxsize=10, ttl=60)
+
+    async def load():
+        await asyncio.sleep(0.01)
+        raise LookupError("down")
+
+    async def main():
+        return await asyncio.gather(*(c.get_or_load("k", load) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, LookupError) for result in results)
+    with pytest.raises(LookupError):
+        asyncio.run(c.get_or_load("k", load))
@@ -0,0 +1,27 @@
+import asyncio
+
+from app import main
+
+
+def loaded_from(monkeypatch, replica: object) -> object:
+    monkeypatch.setattr(main, "replica_engine", replica)
+    read_session = object()
+
+    async def load():
+        async with main.cache_load_session(read_session) as session:
+            return session
+
+    before = asyncio.run(load())
+    main.invalidate_product(1)
+    after = asyncio.run(load())
+    return before is read_session, after is read_session
+
+
+def test_loads_after_invalidation_skip_the_replica(monkeypatch)->None:
+    monkeypatch.setattr(main, "cache_primary_until", 0.0)
+    assert loaded_from(monkeypatch, replica=object()) == (True, False)
+
+
+def test_loads_use_read_session_without_replica(monkeypatch)->None:
+    monkeypatch.setattr(main, "cache_primary_until", 0.0)
+    assert loaded_from(monkeypatch, replica=None) == (True, True)
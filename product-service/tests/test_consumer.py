@@ -0,0 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+
+from aiokafka import TopicPartition
+from aiokafka.errors import IllegalStateError
+
+from app import consumer
+from app.consumer import ConsumerRunner
+
+P0, P1 = TopicPartition("t", 0), TopicPartition("t", 1)
+
+
+class FakeConsumer:
+    # Stands in for AIOKafkaConsumer: a fixed assignment, and a record of
+    # commits and pauses.
+    def __init__(self, **kwargs) -> None:
+        self.assigned = {P0, P1}
+        self.commits: list[dict] = []
+        self.commit_error: Exception | None = None
+        self.paused_partitions: set = set()
+        self.pause_calls = 0
+        self.listener = None
+
+    def subscribe(self, topics, listener=None) -> None:
+        self.listener = listener
+
+    def assignment(self) -> set:
+        return set(self.assigned)
+
+    async def commit(self, offsets) -> None:
+        if self.commit_error is not None:
+            raise self.commit_error
+        self.commits.append(dict(offsets))
+
+    def pause(self, *partitions) -> None:
+        self.pause_calls += 1
+        self.paused_partitions.update(partitions)
+
+    def paused(self) -> set:
+        return set(self.paused_partitions)
+
+    def resume(self, *partitions) -> None:
+        self.paused_partitions.difference_update(partitions)
+
+
+def record(partition: int, offset: int, key: bytes | None) -> SimpleNamespace:
+    return SimpleNamespace(topic="t", partition=partition, offset=offset, key=key, value=b"")
+
+
+def runner_with(monkeypatch, delays: dict[int, float], **kwargs) -> tuple[ConsumerRunner, list]:
+    # Handles each record after delays[offset] seconds and logs when it ends.
+    handled = []
+
+    async def handler(rec) -> None:
+        await asyncio.sleep(delays.get(rec.offset, 0))
+        handled.append(rec.offset)
+
+    monkeypatch.setattr(consumer, "AIOKafkaConsumer", FakeConsumer)
+    monkeypatch.setitem(consumer._handlers, "t", [handler])
+    return ConsumerRunner("t", bootstrap_servers="broker:19092", group_id="g", **kwargs), handled
+
+
+def test_lanes_keep_key_order_and_run_keys_concurrently(monkeypatch)->None:
+    async def main():
+        runner, handled = runner_with(monkeypatch, {0: 0.05})
+        runner._dispatch({P0: [record(0, 0, b"a"), record(0, 1, b"b")]})
+        runner._dispatch({P0: [record(0, 2, b"a")]})
+        await runner.drain(1)
+        return handled
+
+    # b isn't held up by the slow a, and the second a waits for the first.
+    assert asyncio.run(main()) == [1, 0, 2]
+
+
+def test_commits_wait_for_earlier_batches(monkeypatch)->None:
+    async def main():
+        runner, _ = runner_with(monkeypatch, {0: 0.05})
+        runner._dispatch({P0: [record(0, 0, b"a")]})
+        runner._dispatch({P1: [record(1, 5, b"b")]})
+        await asyncio.wait({runner._pending[1][0]})
+        await runner._commit_finished()
+        early = list(runner.consumer.commits)
+        await asyncio.wait({runner._pending[0][0]})
+        await runner._commit_finished()
+        return early, runner.consumer.commits
+
+    early, commits = asyncio.run(main())
+    assert early == []
+    assert commits == [{P0: 1, P1: 6}]
+
+
+def test_backpressure_pauses_then_resumes(monkeypatch)->None:
+    async def main():
+        runner, handled = runner_with(monkeypatch, {0: 0.01, 1: 0.01, 2: 0.01}, max_in_flight=2)
+        runner._dispatch({P0: [record(0, offset, b"a") for offset in range(3)]})
+        await runner._apply_backpressure()
+        return runner, handled
+
+    runner, handled = asyncio.run(main())
+    assert runner.consumer.pause_calls == 1 and runner.consumer.paused() == set()
+    assert handled == [0, 1, 2]
+    assert runner.consumer.commits == [{P0: 3}]
+
+
+def test_revoked_partitions_are_not_committed(monkeypatch)->None:
+    async def main():
+        runner, _ = runner_with(monkeypatch, {})
+        runner._dispatch({P0: [record(0, 0, b"a")], P1: [record(1, 0, b"b")]})
+        runner.consumer.assigned = {P0}
+        await runner.drain(1)
+        # Lost the race with another rebalance: logged, not raised.
+        runner._dispatch({P0: [record(0, 1, b"a")]})
+        runner.consumer.commit_error = IllegalStateError("Partition t-0 is not assigned")
+        await runner.drain(1)
+        return runner.consumer.commits
+
+    assert asyncio.run(main()) == [{P0: 1}]
+
+
+def test_rebalance_commits_batches_in_flight(monkeypatch)->None:
+    async def main():
+        runner, _ = runner_with(monkeypatch, {0: 0.02})
+        runner._dispatch({P0: [record(0, 0, b"a")]})
+        await runner.consumer.listener.on_partitions_revoked({P0})
+        return runner.consumer.commits
+
+    assert asyncio.run(main()) == [{P0: 1}]
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from app.events import (MAGIC, SCHEMA_IDS, SCHEMAS, EventDecodeError, _HEADER, _write_value, decode_event,
+                        encode_event)
+
+product = {"id": 42, "name": "Desk lamp", "description": "Warm white, dimmable",
+           "price": 24.99, "quantity": 130}
+
+
+def test_binary_round_trip()->None:
+    event = decode_event(encode_event("product", product))
+    assert event.type == "product"
+    assert event.version == 1
+    assert event.data == product
+
+
+def test_binary_is_smaller_than_json()->None:
+    assert len(encode_event("product", product)) < len(json.dumps(product).encode("utf-8"))
+
+
+def test_optional_and_negative_values()->None:
+    order = {"id": None, "user_id": 7, "products": -3, "item_count": None, "total_amount": 0.0}
+    assert decode_event(encode_event("order", order)).data == order
+
+
+def test_older_versions_still_decode()->None:
+    # An order event as published before item_count, in schema version 1.
+    buf = bytearray(_HEADER.pack(MAGIC, SCHEMA_IDS["order"], 1))
+    for (_, kind), value in zip(SCHEMAS["order"][1], (5, 7, 42, 19.5)):
+        _write_value(buf, kind, value)
+    event = decode_event(bytes(buf))
+    assert (event.version, event.data) == (1, {"id": 5, "user_id": 7, "products": 42, "total_amount": 19.5})
+
+
+def test_json_fallback_and_legacy_messages()->None:
+    event = decode_event(encode_event("payment", {"id": 1, "amount": 10.5, "payment_method": "Stripe"}, "json"))
+    assert (event.type, event.data["payment_method"]) == ("payment", "Stripe")
+
+    legacy = decode_event(json.dumps(product).encode("utf-8"))
+    assert legacy.type == "unknown"
+    assert legacy.data == product
+
+
+def test_missing_field_is_rejected()->None:
+    with pytest.raises(ValueError):
+        encode_event("product", {"name": "no price"})
+
+
+def test_truncated_event_is_rejected()->None:
+    with pytest.raises(EventDecodeError):
+        decode_event(encode_event("product", product)[:-3])
+
+
+def test_int_list_round_trip()->None:
+    command = {"order_id": 9, "action": "reserve", "product_ids": [3, 1, 2],
+               "quantities": [1, -5, 300], "amount": 12.5}
+    assert decode_event(encode_event("checkout_command", command)).data == command
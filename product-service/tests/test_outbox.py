@@ -0,0 +1,77 @@
+import asyncio
+
+from app import outbox
+from app.models import OutboxEvent
+
+
+class FakeResult:
+    def __init__(self, rows) -> None:
+        self.rows = rows
+
+    def one(self):
+        return self.rows[0]
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    # Answers the relay lock, then the claimed batch, then the update.
+    def __init__(self, lock_taken: bool, events: list[OutboxEvent]) -> None:
+        self.results = [[lock_taken], events, []]
+        self.statements = []
+        self.committed = False
+
+    def __call__(self, *args, **kwargs) -> "FakeSession":
+        return self
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+    async def exec(self, statement) -> FakeResult:
+        self.statements.append(str(statement))
+        return FakeResult(self.results.pop(0))
+
+    async def commit(self) -> None:
+        self.committed = True
+
+
+class FakeProducer:
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send(self, topic, value, key=None) -> asyncio.Future:
+        self.sent.append((topic, value, key))
+        delivery = asyncio.get_running_loop().create_future()
+        delivery.set_result(None)
+        return delivery
+
+
+def _events() -> list[OutboxEvent]:
+    return [OutboxEvent(id=i, topic="t", key="k", payload=b"%d" % i) for i in (1, 2)]
+
+
+def test_relay_skips_the_pass_while_another_relay_holds_the_lock(monkeypatch):
+    session = FakeSession(lock_taken=False, events=_events())
+    monkeypatch.setattr(outbox, "AsyncSession", session)
+    producer = FakeProducer()
+
+    assert asyncio.run(outbox.relay_batch(producer)) == 0
+    assert producer.sent == []
+    assert len(session.statements) == 1
+    assert "pg_try_advisory_xact_lock" in session.statements[0]
+
+
+def test_relay_publishes_in_id_order_under_the_lock(monkeypatch):
+    session = FakeSession(lock_taken=True, events=_events())
+    monkeypatch.setattr(outbox, "AsyncSession", session)
+    producer = FakeProducer()
+
+    assert asyncio.run(outbox.relay_batch(producer)) == 2
+    assert producer.sent == [("t", b"1", b"k"), ("t", b"2", b"k")]
+    assert "pg_try_advisory_xact_lock" in session.statements[0]
+    # The commit marking the batch published also releases the lock.
+    assert session.committed
@@ -1,9 +1,17 @@
 # main.py
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator
+
+from fastapi import FastAPI, Request, Response
 import httpx
 
-app = FastAPI()
+from app import settings
 
 services = [
     {"name": "user-service", "url": "http://user-service:8081/openapi.json"},
@@ -15,16 +23,170 @@ services = [
     {"name": "payment-service", "url": "http://payment-service:8086/openapi.json"}
 ]
 
+_client: httpx.AsyncClient | None = None
 
-@app.get("/merged/openapi.json")
-async def get_combined_openapi():
-    combined_spec = {"openapi": "3.0.0", "info": {
+
+@dataclass
+class MergedSpec:
+    # The merged document, serialized and gzipped once per change.
+    body: bytes
+    gzipped: bytes
+    etag: str
+    degraded: bool
+    built_at: float
+
+
+_merged: MergedSpec | None = None
+_refresh_lock = asyncio.Lock()
+# Last good response per service, with its validators for conditional requests.
+_upstream: dict[str, dict[str, Any]] = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    # One pooled client for the app's lifetime, so specs are fetched over
+    # kept-alive connections instead of a new handshake per service per hit.
+    global _client
+    _client = httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.SPEC_FETCH_TIMEOUT_SECONDS,
+                              connect=settings.SPEC_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(max_connections=settings.SPEC_MAX_CONNECTIONS,
+                            max_keepalive_connections=len(services)),
+    )
+    refresher = asyncio.create_task(refresh_periodically())
+    yield
+    refresher.cancel()
+    await _client.aclose()
+    _client = None
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def fetch_spec(client: httpx.AsyncClient, service: dict[str, Any]) -> dict[str, Any]:
+    cached = _upstream.get(service["name"])
+    headers = {}
+    if cached is not None:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    # httpx timeouts apply per phase; wait_for caps the fetch as a whole.
+    timeout = service.get("timeout", settings.SPEC_FETCH_TIMEOUT_SECONDS)
+    response = await asyncio.wait_for(client.get(service["url"], headers=headers), timeout)
+    if response.status_code == 304 and cached is not None:
+        return cached["spec"]
+    response.raise_for_status()
+    spec = response.json()
+    _upstream[service["name"]] = {"spec": spec, "etag": response.headers.get("etag"),
+                                  "last_modified": response.headers.get("last-modified")}
+    return spec
+
+
+async def fetch_all_specs(client: httpx.AsyncClient) -> list[tuple[dict[str, Any], Any]]:
+    # All services are fetched at once, so the merge takes as long as the
+    # slowest one; a failure comes back as the exception instead of a spec.
+    results = await asyncio.gather(*(fetch_spec(client, service) for service in services),
+                                   return_exceptions=True)
+    return list(zip(services, results))
+
+
+def merge_specs(results: list[tuple[dict[str, Any], Any]]) -> dict[str, Any]:
+    combined_spec: dict[str, Any] = {"openapi": "3.0.0", "info": {
         "title": "Combined API", "version": "1.0.0"}, "paths": {}}
+    unavailable = []
+    stale = []
+    for service, result in results:
+        if isinstance(result, BaseException):
+            cached = _upstream.get(service["name"])
+            if cached is None:
+                unavailable.append({"name": service["name"], "error": repr(result)})
+                continue
+            # Keep the last spec we got rather than drop the service's paths.
+            stale.append({"name": service["name"], "error": repr(result)})
+            result = cached["spec"]
+        combined_spec["paths"].update(result.get("paths", {}))
+    if unavailable or stale:
+        # Serve what we have, but say which services are missing or stale.
+        combined_spec["x-degraded"] = True
+    if unavailable:
+        combined_spec["x-unavailable-services"] = unavailable
+    if stale:
+        combined_spec["x-stale-services"] = stale
+    return combined_spec
+
+
+async def refresh_merged_spec() -> MergedSpec:
+    global _merged
+    if _client is None:
+        raise RuntimeError("HTTP client is not running")
+    started = time.time()
+    async with _refresh_lock:
+        # A refresh that finished while we waited for the lock is as fresh as
+        # ours would be, so concurrent callers share it.
+        if _merged is not None and _merged.built_at > started:
+            return _merged
+        combined_spec = merge_specs(await fetch_all_specs(_client))
+        body = json.dumps(combined_spec, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        if _merged is not None and _merged.etag == etag:
+            _merged.built_at = time.time()
+        else:
+            _merged = MergedSpec(body=body, gzipped=gzip.compress(body, mtime=0), etag=etag,
+                                 degraded=bool(combined_spec.get("x-degraded")), built_at=time.time())
+        return _merged
+
 
-    async with httpx.AsyncClient() as client:
-        for service in services:
-            response = await client.get(service["url"])
-            spec = response.json()
-            combined_spec["paths"].update(spec.get("paths", {}))
+async def refresh_periodically() -> None:
+    while True:
+        try:
+            merged = await refresh_merged_spec()
+            degraded = merged.degraded
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Refreshing the merged spec failed: {e}")
+            degraded = True
+        await asyncio.sleep(settings.SPEC_DEGRADED_RETRY_SECONDS if degraded
+                            else settings.SPEC_REFRESH_INTERVAL_SECONDS)
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    # Honours q-values: "gzip;q=0" refuses gzip, and "*" stands for any
+    # coding not listed by name.
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.lower()] = q
+    q = weights.get("gzip", weights.get("x-gzip", weights.get("*", 0.0)))
+    return q > 0
+
+
+@app.get("/merged/openapi.json")
+async def get_combined_openapi(request: Request):
+    # Served from memory; only the very first request, before the background
+    # refresh has finished, waits on the upstream services.
+    merged = _merged or await refresh_merged_spec()
+    use_gzip = accepts_gzip(request.headers.get("accept-encoding", ""))
+    # The gzipped body is a different representation, so it gets its own tag.
+    etag = merged.etag[:-1] + '-gzip"' if use_gzip else merged.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if merged.degraded:
+        headers["X-Degraded"] = "true"
 
-    return JSONResponse(content=combined_spec)
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=merged.gzipped, media_type="application/json", headers=headers)
+    return Response(content=merged.body, media_type="application/json", headers=headers)
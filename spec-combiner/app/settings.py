@@ -0,0 +1,19 @@
+#settings.py
+from starlette.config import Config
+
+try:
+    config = Config(".env")
+except FileNotFoundError:
+    config = Config()
+
+# Upstream spec fetching. Each fetch gets SPEC_FETCH_TIMEOUT_SECONDS in total
+# unless the service entry sets its own "timeout".
+SPEC_FETCH_TIMEOUT_SECONDS = config("SPEC_FETCH_TIMEOUT_SECONDS", cast=float, default=3)
+SPEC_CONNECT_TIMEOUT_SECONDS = config("SPEC_CONNECT_TIMEOUT_SECONDS", cast=float, default=1)
+SPEC_MAX_CONNECTIONS = config("SPEC_MAX_CONNECTIONS", cast=int, default=20)
+
+# Merged spec cache. It is rebuilt in the background every
+# SPEC_REFRESH_INTERVAL_SECONDS, or every SPEC_DEGRADED_RETRY_SECONDS while a
+# service is missing from it.
+SPEC_REFRESH_INTERVAL_SECONDS = config("SPEC_REFRESH_INTERVAL_SECONDS", cast=float, default=60)
+SPEC_DEGRADED_RETRY_SECONDS = config("SPEC_DEGRADED_RETRY_SECONDS", cast=float, default=5)
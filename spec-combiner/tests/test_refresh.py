@@ -0,0 +1,48 @@
+import asyncio
+import gzip
+
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+def test_concurrent_refreshes_fetch_once(monkeypatch)->None:
+    fetches = 0
+
+    async def fetch_all_specs(client):
+        nonlocal fetches
+        fetches += 1
+        await asyncio.sleep(0.01)
+        return [({"name": "orders"}, {"paths": {"/orders/": {}}})]
+
+    async def run():
+        monkeypatch.setattr(main, "_refresh_lock", asyncio.Lock())
+        first = await asyncio.gather(*(main.refresh_merged_spec() for _ in range(5)))
+        later = await main.refresh_merged_spec()
+        return first, later
+
+    monkeypatch.setattr(main, "fetch_all_specs", fetch_all_specs)
+    monkeypatch.setattr(main, "_client", object())
+    monkeypatch.setattr(main, "_merged", None)
+    first, later = asyncio.run(run())
+    assert len({id(merged) for merged in first}) == 1
+    # A refresh started after the last one finished still fetches.
+    assert fetches == 2
+    assert later.etag == first[0].etag
+
+
+def test_gzip_refused_with_q_zero(monkeypatch)->None:
+    body = b'{"paths": {}}'
+    merged = main.MergedSpec(body=body, gzipped=gzip.compress(body, mtime=0), etag='"abc"',
+                             degraded=False, built_at=0.0)
+    monkeypatch.setattr(main, "_merged", merged)
+    client = TestClient(main.app)
+
+    refused = client.get("/merged/openapi.json", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in refused.headers
+    assert refused.headers["etag"] == '"abc"'
+    assert refused.content == body
+
+    accepted = client.get("/merged/openapi.json", headers={"Accept-Encoding": "gzip;q=0.8"})
+    assert accepted.headers["content-encoding"] == "gzip"
+    assert accepted.headers["etag"] == '"abc-gzip"'
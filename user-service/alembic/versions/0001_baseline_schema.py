@@ -0,0 +1,48 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises: None
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.schema import CreateTable
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+metadata = sa.MetaData()
+
+
+# Databases created before migrations already have these tables from
+# SQLModel.metadata.create_all, and some tables are shared with other services
+# in the same database, so only create what is missing.
+def create_missing_table(name: str, *columns: sa.Column) -> None:
+    table = sa.Table(name, metadata, *columns, sa.PrimaryKeyConstraint("id"))
+    op.execute(CreateTable(table, if_not_exists=True))
+
+
+def upgrade() -> None:
+    create_missing_table(
+        "user",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_name", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("user_email", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("address", sqlmodel.sql.sqltypes.AutoString(length=60), nullable=False),
+        sa.Column("phone_number", sa.Integer(), nullable=False),
+        sa.Column("password", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    # The baseline adopts tables that may predate it or belong to another
+    # service as well, so it never drops them.
+    pass
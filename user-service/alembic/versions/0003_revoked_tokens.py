@@ -0,0 +1,33 @@
+"""revoked tokens
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "revokedtoken",
+        sa.Column("jti", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("jti"),
+    )
+    op.create_index("ix_revokedtoken_expires_at", "revokedtoken", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_revokedtoken_expires_at", table_name="revokedtoken")
+    op.drop_table("revokedtoken")
@@ -1,23 +1,165 @@
 #auth.py
+import asyncio
+import hmac
+import math
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlmodel import Session, select
-from fastapi import Depends, HTTPException, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi import Depends, Header, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 
 from app.models import User
 from app.db_engine import get_session
+from app.keys import key_ring
+from app.revocation import revocations
+from app.throttle import TokenBuckets
 from app import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+class PrincipalCache:
+    # Users resolved from tokens, keyed by the raw token. An entry lives until
+    # the token's exp, capped at ttl so changes made through other replicas
+    # show up too, or until its user is updated or deleted here. The token's
+    # jti is kept alongside so a hit can still be checked for revocation.
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, User, str | None]] = OrderedDict()
+        self._tokens_by_user: dict[int, set[str]] = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> tuple[User, str | None] | None:
+        entry = self._entries.get(token)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                self._drop(token)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, token: str, user: User, exp: float, jti: str | None) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[token] = (min(exp, time.time() + self.ttl), user, jti)
+        self._tokens_by_user[user.id].add(token)
+        while len(self._entries) > self.maxsize:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, token: str) -> None:
+        _, user, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user.id]
+
+    def invalidate_token(self, token: str) -> None:
+        if token in self._entries:
+            self._drop(token)
+            self.invalidations += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        for token in list(self._tokens_by_user.get(user_id, ())):
+            self._drop(token)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits,
+                "misses": self.misses, "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions, "invalidations": self.invalidations}
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_MAX_ENTRIES, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+# bcrypt releases the GIL while it hashes, so a thread pool keeps it off the
+# event loop and runs hashes in parallel. Work beyond the workers plus
+# PASSWORD_HASH_MAX_QUEUE waiting is turned away at once with a 503 rather
+# than queued behind a burst.
+_hash_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+hash_stats = {"in_flight": 0, "max_in_flight": 0, "completed": 0, "rejected": 0}
+
+
+def _hash_done() -> None:
+    # Counted when the worker finishes, even if the request gave up waiting.
+    hash_stats["in_flight"] -= 1
+    hash_stats["completed"] += 1
+
+
+async def _run_hashing(fn, *args):
+    if hash_stats["in_flight"] >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE:
+        hash_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password checks in progress, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    loop = asyncio.get_running_loop()
+    hash_stats["in_flight"] += 1
+    hash_stats["max_in_flight"] = max(hash_stats["max_in_flight"], hash_stats["in_flight"])
+    future = _hash_pool.submit(fn, *args)
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(_hash_done))
+    return await asyncio.wrap_future(future)
+
+
+# Login attempts are limited per client address and per username before any
+# bcrypt work is done, so a credential-stuffing burst is turned away cheaply
+# instead of using up the hashing pool that real logins need.
+client_buckets = TokenBuckets(settings.LOGIN_RATE_PER_CLIENT_PER_MINUTE / 60, settings.LOGIN_BURST_PER_CLIENT,
+                              settings.LOGIN_THROTTLE_MAX_ENTRIES)
+username_buckets = TokenBuckets(settings.LOGIN_RATE_PER_USERNAME_PER_MINUTE / 60, settings.LOGIN_BURST_PER_USERNAME,
+                                settings.LOGIN_THROTTLE_MAX_ENTRIES)
+
+
+def _client_address(request: Request) -> str:
+    if settings.LOGIN_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def throttle_login(request: Request, username: str) -> None:
+    # The username is only charged once the client is let through, so one
+    # noisy client can't also use up the buckets of the names it tries.
+    wait = client_buckets.take(_client_address(request))
+    if not wait:
+        wait = username_buckets.take(username.lower())
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, retry later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+async def sweep_login_buckets_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.LOGIN_THROTTLE_SWEEP_SECONDS)
+        client_buckets.sweep()
+        username_buckets.sweep()
+
+
+async def verify_password(plain_password, hashed_password):
+    return await _run_hashing(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await _run_hashing(pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -25,32 +167,68 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    # The jti identifies this token in the revocation list.
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    if settings.ALGORITHM == "HS256":
+        return jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
+    # The kid tells verifiers which key from the JWKS to check against.
+    return jwt.encode(to_encode, key_ring.signing_key, algorithm=settings.ALGORITHM,
+                      headers={"kid": key_ring.signing_kid})
+
+def decode_access_token(token: str) -> dict:
+    if settings.ALGORITHM == "HS256":
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    key = key_ring.public_keys.get(jwt.get_unverified_header(token).get("kid"))
+    if key is None:
+        raise JWTError("Unknown signing key")
+    return jwt.decode(token, key, algorithms=[settings.ALGORITHM])
+
+def require_internal_token(x_internal_token: str = Header(default="")) -> None:
+    # For service-to-service routes. Closed until INTERNAL_API_TOKEN is set.
+    expected = str(settings.INTERNAL_API_TOKEN)
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Internal API is not configured")
+    if not hmac.compare_digest(x_internal_token.encode("utf-8"), expected.encode("utf-8")):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid internal token")
 
-def authenticate_user(session: Session, username: str, password: str):
-    user = session.exec(select(User).where(User.user_name == username)).first()
+async def authenticate_user(session: AsyncSession, username: str, password: str):
+    user = (await session.exec(select(User).where(User.user_name == username))).first()
     if not user:
         return False
-    if not verify_password(password, user.password):
+    if not await verify_password(password, user.password):
         return False
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # A cached entry never outlives the token's exp, so a hit needs neither
+    # the signature check nor the user lookup. Revocation is still checked,
+    # which for a token that was never revoked is a filter probe in memory.
+    cached = principal_cache.get(token)
+    if cached is not None:
+        user, jti = cached
+        if jti is not None and await revocations.is_revoked(session, jti):
+            principal_cache.invalidate_token(token)
+            raise credentials_exception
+        return user
+
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = session.exec(select(User).where(User.user_name == username)).first()
+    # Tokens issued before jtis were added can't be revoked individually.
+    jti = payload.get("jti")
+    if jti is not None and await revocations.is_revoked(session, jti):
+        raise credentials_exception
+    user = (await session.exec(select(User).where(User.user_name == username))).first()
     if user is None:
         raise credentials_exception
+    principal_cache.put(token, user, payload["exp"], jti)
     return user
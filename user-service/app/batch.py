@@ -0,0 +1,43 @@
+#batch.py
+from sqlalchemy import Integer, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.cache import TTLCache
+from app.models import User, UserSummary
+from app import settings
+
+# Summaries by user id. Updates and deletes here drop the entry; other
+# replicas catch up within the TTL.
+summary_cache = TTLCache(settings.USER_BATCH_CACHE_MAX_ENTRIES, settings.USER_BATCH_CACHE_TTL_SECONDS)
+
+
+async def fetch_user_summaries(session: AsyncSession, ids: list[int]) -> tuple[list[UserSummary], list[int]]:
+    # Cached ids are answered from memory and the rest in one query. The ids
+    # go in as a single array parameter, so the statement is the same for
+    # any number of them.
+    found: dict[int, UserSummary] = {}
+    misses = []
+    for user_id in dict.fromkeys(ids):
+        hit, summary = summary_cache.get(user_id)
+        if hit:
+            summary_cache.hits += 1
+            found[user_id] = summary
+        else:
+            summary_cache.misses += 1
+            misses.append(user_id)
+
+    if misses:
+        statement = (select(User.id, User.user_name, User.user_email, User.phone_number)
+                     .where(User.id == any_(bindparam("ids", misses, type_=ARRAY(Integer)))))
+        for row in (await session.exec(statement)).all():
+            summary = UserSummary(id=row.id, user_name=row.user_name, user_email=row.user_email,
+                                  phone_number=row.phone_number)
+            summary_cache.set(row.id, summary)
+            found[row.id] = summary
+
+    # Results keep the order of the request.
+    users = [found[user_id] for user_id in dict.fromkeys(ids) if user_id in found]
+    missing = [user_id for user_id in dict.fromkeys(ids) if user_id not in found]
+    return users, missing
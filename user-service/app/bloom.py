@@ -0,0 +1,47 @@
+#bloom.py
+import hashlib
+import math
+
+
+class BloomFilter:
+    # Fixed-size Bloom filter over strings. might_contain() never misses an
+    # added item and is wrong about an absent one with probability close to
+    # fp_rate while no more than capacity items have been added.
+    def __init__(self, capacity: int, fp_rate: float) -> None:
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _hashes(self, item: str) -> tuple[int, int]:
+        # Double hashing: the k positions are h1 + i * h2 for one digest.
+        digest = int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest(), "little")
+        return digest & 0xFFFFFFFFFFFFFFFF, (digest >> 64) | 1
+
+    def add(self, item: str) -> None:
+        h1, h2 = self._hashes(item)
+        bits, size = self._bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def might_contain(self, item: str) -> bool:
+        # Most items looked up were never added and stop at the first clear bit.
+        h1, h2 = self._hashes(item)
+        bits, size = self._bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+    def expected_fp_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
@@ -0,0 +1,84 @@
+#keys.py
+import asyncio
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk
+
+from app import settings
+
+
+class KeyRing:
+    # RS256 keys, one PKCS#8 PEM file per key in JWT_KEYS_DIR, named <kid>.pem.
+    # The newest file by name signs; every key in the directory is published in
+    # the JWKS so tokens it signed keep verifying. To rotate, add a newer file,
+    # then remove the old one once ACCESS_TOKEN_EXPIRE_MINUTES have passed.
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.signing_kid: str | None = None
+        self.signing_key: bytes = b""
+        self.public_keys: dict[str, dict] = {}
+        self.jwks_body = b""
+        self.jwks_etag = ""
+        self._listing: tuple | None = None
+
+    def _generate(self) -> Path:
+        # Only with JWT_GENERATE_DEV_KEY: each replica would make its own key,
+        # so deployments mount the same key files into every replica.
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        path = self.directory / f"{time.strftime('%Y%m%d%H%M%S', time.gmtime())}.pem"
+        path.write_bytes(key.private_bytes(serialization.Encoding.PEM,
+                                           serialization.PrivateFormat.PKCS8,
+                                           serialization.NoEncryption()))
+        path.chmod(0o600)
+        print(f"Generated JWT signing key {path.stem}")
+        return path
+
+    def load(self) -> None:
+        if settings.JWT_GENERATE_DEV_KEY:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        files = sorted(self.directory.glob("*.pem")) if self.directory.is_dir() else []
+        if not files:
+            if not settings.JWT_GENERATE_DEV_KEY:
+                raise RuntimeError(f"No JWT signing keys (*.pem) in {self.directory}; "
+                                   "mount them, or set JWT_GENERATE_DEV_KEY for development")
+            files = [self._generate()]
+        listing = tuple((path.name, path.stat().st_mtime_ns) for path in files)
+        if listing == self._listing:
+            return
+
+        public_keys = {}
+        for path in files:
+            private_key = serialization.load_pem_private_key(path.read_bytes(), password=None)
+            public_pem = private_key.public_key().public_bytes(
+                serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+            public_keys[path.stem] = {**jwk.construct(public_pem, "RS256").to_dict(),
+                                      "kid": path.stem, "use": "sig"}
+
+        self.signing_kid = files[-1].stem
+        self.signing_key = files[-1].read_bytes()
+        self.public_keys = public_keys
+        # Served as-is from /.well-known/jwks.json.
+        self.jwks_body = json.dumps({"keys": list(public_keys.values())}, separators=(",", ":")).encode("utf-8")
+        self.jwks_etag = '"' + hashlib.blake2b(self.jwks_body, digest_size=16).hexdigest() + '"'
+        self._listing = listing
+        print(f"Loaded JWT keys {sorted(public_keys)}, signing with {self.signing_kid}")
+
+
+key_ring = KeyRing(settings.JWT_KEYS_DIR)
+
+
+async def reload_keys_periodically() -> None:
+    # Picks up a rotated key without a restart.
+    if settings.ALGORITHM == "HS256":
+        return
+    while True:
+        await asyncio.sleep(settings.JWT_KEYS_RELOAD_SECONDS)
+        try:
+            key_ring.load()
+        except Exception as e:
+            print(f"Reloading JWT keys failed: {e}")
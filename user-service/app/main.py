@@ -1,26 +1,44 @@
 #main.py
 from contextlib import asynccontextmanager
 from typing import Annotated, AsyncGenerator
-from sqlmodel import Session, select
-from fastapi import FastAPI, Depends, HTTPException, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
 from aiokafka import AIOKafkaProducer
 import asyncio
-import json
-from datetime import timedelta
+from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordRequestForm
 
-from app.models import User, Token
-from app.db_engine import create_db_and_tables, get_session
-from app.kafka import consume_messages, get_kafka_producer
-from app.auth import authenticate_user, create_access_token, get_current_user, get_password_hash
+from app.models import RevokedToken, User, Token, UserBatch, UserBatchRequest
+from app.batch import fetch_user_summaries, summary_cache
+from app.db_engine import get_pool_stats, get_read_session, get_session
+from app.events import encode_event
+from app.kafka import consume_messages, get_kafka_producer, start_kafka_producer, stop_kafka_producer
+from app.auth import (authenticate_user, client_buckets, create_access_token, decode_access_token,
+                      get_current_user, get_password_hash, hash_stats, oauth2_scheme, principal_cache,
+                      require_internal_token, sweep_login_buckets_periodically, throttle_login,
+                      username_buckets)
+from app.keys import key_ring, reload_keys_periodically
+from app.revocation import rebuild_revocations_periodically, revocations, sync_revocations
 from app import settings
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    print("Creating tables...")
+    if settings.ALGORITHM != "HS256":
+        key_ring.load()  # raises, failing startup, when there are no keys
+    keys = asyncio.create_task(reload_keys_periodically())
     task = asyncio.create_task(consume_messages('users', 'broker:19092'))
-    create_db_and_tables()
+    revocation_sync = asyncio.create_task(sync_revocations('users', settings.BOOTSTRAP_SERVER))
+    revocation_rebuild = asyncio.create_task(rebuild_revocations_periodically())
+    login_sweep = asyncio.create_task(sweep_login_buckets_periodically())
+    await start_kafka_producer()
     yield
+    task.cancel()
+    keys.cancel()
+    revocation_sync.cancel()
+    revocation_rebuild.cancel()
+    login_sweep.cancel()
+    await stop_kafka_producer()
 
 app = FastAPI(lifespan=lifespan, title="User Service",
               version="0.0.1", description="The User Service API is responsible for managing user authentication, registration, and profiles.")
@@ -30,38 +48,78 @@ def read_root():
     return {"Hello": "User Service"}
 
 
+@app.get("/db/pool")
+def read_pool_stats():
+    return get_pool_stats()
+
+
+@app.get("/.well-known/jwks.json")
+def read_jwks(request: Request):
+    # Public keys for verifying tokens locally in the other services.
+    headers = {"ETag": key_ring.jwks_etag,
+               "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}"}
+    if request.headers.get("if-none-match") == key_ring.jwks_etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=key_ring.jwks_body, media_type="application/json", headers=headers)
+
+
+@app.get("/auth/cache")
+def read_principal_cache_stats():
+    return principal_cache.stats()
+
+
+@app.get("/auth/throttle")
+def read_login_throttle_stats():
+    return {"client": client_buckets.stats(), "username": username_buckets.stats()}
+
+
+@app.get("/auth/revocations")
+def read_revocation_stats():
+    return revocations.stats()
+
+
+@app.get("/auth/hashing")
+def read_hashing_stats():
+    return {**hash_stats, "workers": settings.PASSWORD_HASH_WORKERS,
+            "max_queue": settings.PASSWORD_HASH_MAX_QUEUE}
+
+
 @app.post("/users/register", response_model=User)
 async def register_user(
     user: User,
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
     producer: Annotated[AIOKafkaProducer, Depends(get_kafka_producer)]
 ) -> User:
     try:
-        existing_user = session.exec(select(User).where(User.user_email == user.user_email)).first()
+        existing_user = (await session.exec(select(User).where(User.user_email == user.user_email))).first()
         if existing_user:
             raise HTTPException(status_code=400, detail="User with this email already exists")
 
-        user.password = get_password_hash(user.password)  # Hashing the password
+        user.password = await get_password_hash(user.password)  # Hashing the password
         session.add(user)
-        session.commit()
-        session.refresh(user)
+        await session.commit()
+        await session.refresh(user)
 
         user_dict = user.dict()
         user_dict.pop("password")  # Don't publish the password
-        user_json = json.dumps(user_dict).encode("utf-8")
-        await producer.send_and_wait("users", user_json)
+        user_event = encode_event("user", user_dict, settings.EVENT_ENCODING)
+        await producer.send_and_wait("users", user_event)
 
         return user
+    except HTTPException as e:
+        raise e
     except Exception as e:
         print(f"Error occurred during user registration: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
 @app.post("/token", response_model=Token)
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    user = authenticate_user(session, form_data.username, form_data.password)
+    throttle_login(request, form_data.username)
+    user = await authenticate_user(session, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -74,32 +132,82 @@ async def login_for_access_token(
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.post("/users/logout")
+async def logout(
+    session: Annotated[AsyncSession, Depends(get_session)],
+    producer: Annotated[AIOKafkaProducer, Depends(get_kafka_producer)],
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        payload = decode_access_token(token)
+        jti = payload.get("jti")
+        if jti is None:
+            raise HTTPException(status_code=400, detail="This token has no id and can't be revoked")
+
+        # merge so that logging out twice at once doesn't trip the primary key.
+        await session.merge(RevokedToken(jti=jti, expires_at=datetime.utcfromtimestamp(payload["exp"])))
+        await session.commit()
+        revocations.add(jti)
+        principal_cache.invalidate_token(token)
+
+        # The other replicas add it to their filters from this event.
+        revocation_event = encode_event("revocation", {"jti": jti, "expires_at": payload["exp"]},
+                                        settings.EVENT_ENCODING)
+        await producer.send_and_wait("users", revocation_event)
+        return {"detail": "Token revoked"}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f"Error occurred during logout: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
 @app.get("/users/me/", response_model=User)
 async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @app.get("/users/", response_model=list[User])
-def read_users(
-    session: Annotated[Session, Depends(get_session)],
+async def read_users(
+    session: Annotated[AsyncSession, Depends(get_session)],
     current_user: User = Depends(get_current_user)  # Secure the endpoint
 ):
     try:
-        users = session.exec(select(User).where(User.id == current_user.id)).all()
+        users = (await session.exec(select(User).where(User.id == current_user.id))).all()
         return users
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/users/batch", response_model=UserBatch, dependencies=[Depends(require_internal_token)])
+async def read_users_batch(
+    batch: UserBatchRequest,
+    session: Annotated[AsyncSession, Depends(get_read_session)]
+) -> UserBatch:
+    # Lets other services enrich a list of records with user details in one
+    # call instead of one GET per user.
+    if len(batch.ids) > settings.USER_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.USER_BATCH_MAX_IDS} ids per batch")
+    try:
+        users, missing = await fetch_user_summaries(session, batch.ids)
+        return UserBatch(users=users, missing=missing)
+    except Exception as e:
+        print(f"Error occurred during batch user lookup: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@app.get("/users/batch/cache")
+def read_user_batch_cache_stats():
+    return summary_cache.stats()
+
 @app.get("/users/{user_id}", response_model=User)
-def read_user_by_id(
+async def read_user_by_id(
     user_id: int,
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
     current_user: User = Depends(get_current_user)  # Secure the endpoint
 ):
     try:
         if user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to access this user data")
         
-        user = session.get(User, user_id)
+        user = await session.get(User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return user
@@ -107,17 +215,17 @@ def read_user_by_id(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/users/{user_id}", response_model=User)
-def update_user(
+async def update_user(
     user_id: int,
     updated_user: User,
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
     current_user: User = Depends(get_current_user)  # Secure the endpoint
 ) -> User:
     try:
         if user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to update this user data")
         
-        user = session.get(User, user_id)
+        user = await session.get(User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -126,28 +234,32 @@ def update_user(
             setattr(user, key, value)
 
         session.add(user)
-        session.commit()
-        session.refresh(user)
+        await session.commit()
+        principal_cache.invalidate_user(user_id)
+        summary_cache.invalidate(user_id)
+        await session.refresh(user)
         return user
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
     current_user: User = Depends(get_current_user)  # Secure the endpoint
 ):
     try:
         if user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to delete this user data")
         
-        user = session.get(User, user_id)
+        user = await session.get(User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        session.delete(user)
-        session.commit()
+        await session.delete(user)
+        await session.commit()
+        principal_cache.invalidate_user(user_id)
+        summary_cache.invalidate(user_id)
         return {"detail": "User deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,16 +2,36 @@
 
 #models.py
 from sqlmodel import SQLModel, Field
+from datetime import datetime
 from typing import Optional
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_name: str
-    user_email: str
+    user_name: str = Field(index=True)
+    user_email: str = Field(index=True)
     address: str = Field(max_length=60)
     phone_number: int
     password: str
 
+class RevokedToken(SQLModel, table=True):
+    # Rows are only needed until the token would have expired anyway.
+    jti: str = Field(primary_key=True)
+    expires_at: datetime = Field(index=True)
+
+class UserSummary(SQLModel):
+    # What other services need to render a user; never the password.
+    id: int
+    user_name: str
+    user_email: str
+    phone_number: int
+
+class UserBatchRequest(SQLModel):
+    ids: list[int] = Field(min_length=1)
+
+class UserBatch(SQLModel):
+    users: list[UserSummary]
+    missing: list[int]
+
 class Token(SQLModel):
     access_token: str
     token_type: str
@@ -0,0 +1,128 @@
+#revocation.py
+import asyncio
+from datetime import datetime
+
+from aiokafka import AIOKafkaConsumer
+from sqlmodel import delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.bloom import BloomFilter
+from app.db_engine import engine
+from app.events import EventDecodeError, decode_event
+from app.models import RevokedToken
+from app import settings
+
+
+class RevocationList:
+    # Revoked token ids live in the revokedtoken table; every replica mirrors
+    # them in a Bloom filter so that the common case, a token that was never
+    # revoked, is answered from memory. Only a filter hit (a revoked token or
+    # a false positive) goes to the table for the exact answer. Until the
+    # filter is in sync (loaded, with the consumer of new revocations
+    # running) every check goes to the table instead.
+    def __init__(self, capacity: int, fp_rate: float) -> None:
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.filter = BloomFilter(capacity, fp_rate)
+        # jtis seen while a rebuild is reading the table, replayed onto the
+        # new filter so none are lost in the swap.
+        self._pending: list[str] | None = None
+        self.synced = False
+        self.checks = 0
+        self.table_checks = 0
+        self.filter_hits = 0
+        self.confirmed = 0
+        self.rebuilds = 0
+
+    def add(self, jti: str) -> None:
+        self.filter.add(jti)
+        if self._pending is not None:
+            self._pending.append(jti)
+
+    async def is_revoked(self, session: AsyncSession, jti: str) -> bool:
+        self.checks += 1
+        if not self.synced:
+            self.table_checks += 1
+        elif not self.filter.might_contain(jti):
+            return False
+        else:
+            self.filter_hits += 1
+        revoked = await session.get(RevokedToken, jti) is not None
+        if revoked:
+            self.confirmed += 1
+        return revoked
+
+    async def rebuild(self) -> None:
+        # A Bloom filter can't forget, so expired entries are dropped by
+        # building a fresh one from the live rows, sized for at least twice as
+        # many as there are now.
+        self._pending = []
+        try:
+            async with AsyncSession(engine) as session:
+                now = datetime.utcnow()
+                await session.exec(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+                await session.commit()
+                jtis = (await session.exec(select(RevokedToken.jti).where(RevokedToken.expires_at > now))).all()
+            bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.fp_rate)
+            for jti in jtis:
+                bloom.add(jti)
+            for jti in self._pending:
+                bloom.add(jti)
+            self.filter = bloom
+            self.rebuilds += 1
+        finally:
+            self._pending = None
+        print(f"Revocation filter rebuilt with {self.filter.count} entries")
+
+    def stats(self) -> dict:
+        return {"entries": self.filter.count, "capacity": self.filter.capacity,
+                "bytes": self.filter.nbytes, "hashes": self.filter.hashes,
+                "expected_fp_rate": round(self.filter.expected_fp_rate(), 6),
+                "synced": self.synced, "checks": self.checks,
+                "table_checks": self.table_checks, "filter_hits": self.filter_hits,
+                "confirmed": self.confirmed, "rebuilds": self.rebuilds}
+
+
+revocations = RevocationList(settings.REVOCATION_FILTER_CAPACITY, settings.REVOCATION_FILTER_FP_RATE)
+
+
+async def sync_revocations(topic: str, bootstrap_servers: str) -> None:
+    # Every replica needs every revocation, so this consumer joins no group.
+    # It is started before the table is read so that nothing revoked in
+    # between is missed, then applies new revocations as they are published.
+    # If Kafka or the database fails, checks fall back to the table while
+    # this retries with backoff, starting over from a fresh rebuild.
+    delay = settings.REVOCATION_SYNC_RETRY_SECONDS
+    while True:
+        consumer = AIOKafkaConsumer(topic, bootstrap_servers=bootstrap_servers,
+                                    group_id=None, auto_offset_reset="latest")
+        try:
+            await consumer.start()
+            await revocations.rebuild()
+            revocations.synced = True
+            delay = settings.REVOCATION_SYNC_RETRY_SECONDS
+            async for record in consumer:
+                try:
+                    event = decode_event(record.value)
+                except EventDecodeError:
+                    continue
+                if event.type == "revocation":
+                    revocations.add(event.data["jti"])
+            print(f"Revocation consumer stopped, restarting in {delay:g}s")
+        except Exception as e:
+            print(f"Revocation sync failed, retrying in {delay:g}s: {e}")
+        finally:
+            # Revocations published while this is down would be missed.
+            revocations.synced = False
+            await consumer.stop()
+        await asyncio.sleep(delay)
+        delay = min(2 * delay, settings.REVOCATION_SYNC_RETRY_MAX_SECONDS)
+
+
+async def rebuild_revocations_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.REVOCATION_FILTER_REBUILD_SECONDS)
+        try:
+            await revocations.rebuild()
+        except Exception as e:
+            print(f"Rebuilding the revocation filter failed: {e}")
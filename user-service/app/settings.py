@@ -1,4 +1,6 @@
 #settings.py
+import os
+
 from starlette.config import Config
 from starlette.datastructures import Secret
 
@@ -13,11 +15,99 @@ KAFKA_ORDER_TOPIC = config("KAFKA_ORDER_TOPIC", cast=str)
 KAFKA_CONSUMER_GROUP_ID_FOR_PRODUCT = config("KAFKA_CONSUMER_GROUP_ID_FOR_PRODUCT", cast=str)
 
 SECRET_KEY = config("SECRET_KEY", cast=str)
-ALGORITHM = config("ALGORITHM", cast=str, default="HS256")
+ALGORITHM = config("ALGORITHM", cast=str, default="RS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = config("ACCESS_TOKEN_EXPIRE_MINUTES", cast=int, default=30)
 
 TEST_DATABASE_URL = config("TEST_DATABASE_URL", cast=Secret)
 
+# Kafka producer tuning. Compression accepts gzip, snappy, lz4 or zstd (lz4 and
+# zstd need the matching aiokafka extra installed); leave empty to disable.
+KAFKA_PRODUCER_LINGER_MS = config("KAFKA_PRODUCER_LINGER_MS", cast=int, default=5)
+KAFKA_PRODUCER_MAX_BATCH_SIZE = config("KAFKA_PRODUCER_MAX_BATCH_SIZE", cast=int, default=65536)
+KAFKA_PRODUCER_COMPRESSION = config("KAFKA_PRODUCER_COMPRESSION", cast=str, default="")
+KAFKA_PRODUCER_ACKS = config("KAFKA_PRODUCER_ACKS", cast=str, default="all")
+
+# Kafka consumer runner
+KAFKA_CONSUMER_MAX_RECORDS = config("KAFKA_CONSUMER_MAX_RECORDS", cast=int, default=500)
+KAFKA_CONSUMER_WORKERS = config("KAFKA_CONSUMER_WORKERS", cast=int, default=16)
+KAFKA_CONSUMER_MAX_IN_FLIGHT = config("KAFKA_CONSUMER_MAX_IN_FLIGHT", cast=int, default=5000)
+KAFKA_CONSUMER_MAX_RETRIES = config("KAFKA_CONSUMER_MAX_RETRIES", cast=int, default=3)
+KAFKA_CONSUMER_STATS_INTERVAL_SECONDS = config("KAFKA_CONSUMER_STATS_INTERVAL_SECONDS", cast=float, default=60)
+# How long a rebalance waits for batches in flight to finish so their offsets
+# can be committed before the partitions are handed over.
+KAFKA_CONSUMER_REVOKE_TIMEOUT_SECONDS = config("KAFKA_CONSUMER_REVOKE_TIMEOUT_SECONDS", cast=float, default=30)
+
+# Wire format for published events: "binary" (compact, schema-versioned) or
+# "json". Consumers detect the format per message, so either can be rolled out.
+EVENT_ENCODING = config("EVENT_ENCODING", cast=str, default="binary")
+
+# Database connection pool. Each replica can hold up to DB_POOL_SIZE +
+# DB_MAX_OVERFLOW connections, so keep replicas * (size + overflow) for every
+# service below Postgres max_connections.
+DB_POOL_SIZE = config("DB_POOL_SIZE", cast=int, default=5)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", cast=int, default=10)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", cast=float, default=30)
+DB_POOL_RECYCLE = config("DB_POOL_RECYCLE", cast=int, default=300)
+DB_POOL_PRE_PING = config("DB_POOL_PRE_PING", cast=bool, default=True)
+DB_STATEMENT_TIMEOUT_MS = config("DB_STATEMENT_TIMEOUT_MS", cast=int, default=0)
+
+# Optional read replica for read-only routes; leave empty to keep every query on
+# the primary. After a write, that client reads from the primary for
+# DB_REPLICA_STICKY_SECONDS, and a replica that fails a connection check is
+# skipped for DB_REPLICA_RETRY_SECONDS.
+DATABASE_REPLICA_URL = config("DATABASE_REPLICA_URL", cast=Secret, default="")
+DB_REPLICA_STICKY_SECONDS = config("DB_REPLICA_STICKY_SECONDS", cast=float, default=5)
+DB_REPLICA_RETRY_SECONDS = config("DB_REPLICA_RETRY_SECONDS", cast=float, default=30)
+
+# Users resolved from bearer tokens. Entries expire with the token, or after
+# PRINCIPAL_CACHE_TTL_SECONDS, whichever is sooner.
+PRINCIPAL_CACHE_MAX_ENTRIES = config("PRINCIPAL_CACHE_MAX_ENTRIES", cast=int, default=10000)
+PRINCIPAL_CACHE_TTL_SECONDS = config("PRINCIPAL_CACHE_TTL_SECONDS", cast=float, default=60)
+
+# bcrypt runs on PASSWORD_HASH_WORKERS threads; beyond PASSWORD_HASH_MAX_QUEUE
+# waiting hashes, logins and registrations get a 503 instead of queueing.
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", cast=int, default=os.cpu_count() or 2)
+PASSWORD_HASH_MAX_QUEUE = config("PASSWORD_HASH_MAX_QUEUE", cast=int, default=32)
+
+# RS256 signing keys, one <kid>.pem per key; the newest signs and all are
+# published at /.well-known/jwks.json. ALGORITHM=HS256 keeps the old
+# SECRET_KEY signing instead. Startup fails when there are no keys, unless
+# JWT_GENERATE_DEV_KEY is set to have one generated (development only: every
+# replica would sign with a different key).
+JWT_KEYS_DIR = config("JWT_KEYS_DIR", cast=str, default="keys")
+JWT_GENERATE_DEV_KEY = config("JWT_GENERATE_DEV_KEY", cast=bool, default=False)
+JWT_KEYS_RELOAD_SECONDS = config("JWT_KEYS_RELOAD_SECONDS", cast=float, default=60)
+JWKS_MAX_AGE_SECONDS = config("JWKS_MAX_AGE_SECONDS", cast=int, default=300)
 
+# Revoked token ids are mirrored in a Bloom filter sized for
+# REVOCATION_FILTER_CAPACITY entries at REVOCATION_FILTER_FP_RATE false
+# positives (about 1.8 MB for a million at 0.1%). It is rebuilt from the table
+# every REVOCATION_FILTER_REBUILD_SECONDS to drop expired tokens.
+REVOCATION_FILTER_CAPACITY = config("REVOCATION_FILTER_CAPACITY", cast=int, default=1000000)
+REVOCATION_FILTER_FP_RATE = config("REVOCATION_FILTER_FP_RATE", cast=float, default=0.001)
+REVOCATION_FILTER_REBUILD_SECONDS = config("REVOCATION_FILTER_REBUILD_SECONDS", cast=float, default=3600)
+# While the filter is out of sync (Kafka or the database down) checks go to
+# the table, and syncing is retried after REVOCATION_SYNC_RETRY_SECONDS,
+# doubling up to REVOCATION_SYNC_RETRY_MAX_SECONDS.
+REVOCATION_SYNC_RETRY_SECONDS = config("REVOCATION_SYNC_RETRY_SECONDS", cast=float, default=1)
+REVOCATION_SYNC_RETRY_MAX_SECONDS = config("REVOCATION_SYNC_RETRY_MAX_SECONDS", cast=float, default=60)
 
+# Login attempts per client address and per username, as token buckets that
+# allow a burst and then refill at the per-minute rate; over the limit /token
+# answers 429 before any password check. Set LOGIN_TRUST_FORWARDED_FOR only
+# behind a proxy that sets X-Forwarded-For. Buckets are per process.
+LOGIN_RATE_PER_CLIENT_PER_MINUTE = config("LOGIN_RATE_PER_CLIENT_PER_MINUTE", cast=float, default=30)
+LOGIN_BURST_PER_CLIENT = config("LOGIN_BURST_PER_CLIENT", cast=float, default=10)
+LOGIN_RATE_PER_USERNAME_PER_MINUTE = config("LOGIN_RATE_PER_USERNAME_PER_MINUTE", cast=float, default=10)
+LOGIN_BURST_PER_USERNAME = config("LOGIN_BURST_PER_USERNAME", cast=float, default=5)
+LOGIN_THROTTLE_MAX_ENTRIES = config("LOGIN_THROTTLE_MAX_ENTRIES", cast=int, default=100000)
+LOGIN_THROTTLE_SWEEP_SECONDS = config("LOGIN_THROTTLE_SWEEP_SECONDS", cast=float, default=60)
+LOGIN_TRUST_FORWARDED_FOR = config("LOGIN_TRUST_FORWARDED_FOR", cast=bool, default=False)
 
+# POST /users/batch, for other services. Callers send INTERNAL_API_TOKEN in
+# X-Internal-Token; while it is empty the route refuses every call. Resolved
+# users are cached for USER_BATCH_CACHE_TTL_SECONDS (0 entries turns it off).
+INTERNAL_API_TOKEN = config("INTERNAL_API_TOKEN", cast=Secret, default="")
+USER_BATCH_MAX_IDS = config("USER_BATCH_MAX_IDS", cast=int, default=500)
+USER_BATCH_CACHE_MAX_ENTRIES = config("USER_BATCH_CACHE_MAX_ENTRIES", cast=int, default=10000)
+USER_BATCH_CACHE_TTL_SECONDS = config("USER_BATCH_CACHE_TTL_SECONDS", cast=float, default=5)
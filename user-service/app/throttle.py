@@ -0,0 +1,55 @@
+#throttle.py
+import time
+from collections import OrderedDict
+
+
+class TokenBuckets:
+    # One token bucket per key, holding up to burst tokens and refilling at
+    # rate tokens per second. A bucket is only (tokens, last update), kept in
+    # order of last use, so a check is O(1) and sweeping stops at the first
+    # bucket that is still refilling. A bucket left alone long enough to fill
+    # up is the same as no bucket and is swept.
+    def __init__(self, rate: float, burst: float, max_entries: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self.idle_seconds = burst / rate
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self.allowed = 0
+        self.throttled = 0
+        self.evictions = 0
+
+    def take(self, key: str) -> float:
+        # Returns 0 if a token was taken, else the seconds until one is due.
+        now = time.monotonic()
+        entry = self._buckets.pop(key, None)
+        tokens = self.burst if entry is None else min(self.burst, entry[0] + (now - entry[1]) * self.rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+            self.allowed += 1
+        else:
+            wait = (1 - tokens) / self.rate
+            self.throttled += 1
+        self._buckets[key] = (tokens, now)
+        # Under a spray of distinct keys the oldest buckets go first; those
+        # are the closest to full anyway.
+        if len(self._buckets) > self.max_entries:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+        return wait
+
+    def sweep(self) -> int:
+        cutoff = time.monotonic() - self.idle_seconds
+        swept = 0
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if updated > cutoff:
+                break
+            del self._buckets[key]
+            swept += 1
+        return swept
+
+    def stats(self) -> dict:
+        return {"buckets": len(self._buckets), "rate_per_second": self.rate, "burst": self.burst,
+                "allowed": self.allowed, "throttled": self.throttled, "evictions": self.evictions}
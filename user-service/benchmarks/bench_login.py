@@ -0,0 +1,87 @@
+#bench_login.py
+#
+# Latency of an endpoint that never touches bcrypt (GET /) while a burst of
+# logins runs against the same single worker. With hashing on the event loop
+# every login stalls GET / too; with the hashing pool it should stay flat.
+#
+#   poetry run uvicorn app.main:app --port 8081 --workers 1
+#   poetry run python -m benchmarks.bench_login --url http://localhost:8081 --logins 200
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def summary(label: str, latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+    return (f"{label}: n={len(latencies)} p50={statistics.median(latencies) * 1000:.2f}ms "
+            f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f}ms "
+            f"max={latencies[-1] * 1000:.2f}ms")
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def login_burst(client: httpx.AsyncClient, username: str, password: str,
+                      logins: int, concurrency: int) -> dict[int, int]:
+    statuses: dict[int, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login() -> None:
+        async with semaphore:
+            response = await client.post("/token", data={"username": username, "password": password})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(login() for _ in range(logins)))
+    return statuses
+
+
+async def run(args: argparse.Namespace) -> None:
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    password = "correct horse battery staple"
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120) as client:
+        response = await client.post("/users/register", json={
+            "user_name": username, "user_email": f"{username}@example.com", "address": "Benchmark Street 1",
+            "phone_number": 5550100, "password": password})
+        response.raise_for_status()
+
+        stop = asyncio.Event()
+        idle = asyncio.create_task(probe(client, stop, args.interval))
+        await asyncio.sleep(args.baseline)
+        stop.set()
+        print(summary("GET / idle", await idle))
+
+        stop = asyncio.Event()
+        busy = asyncio.create_task(probe(client, stop, args.interval))
+        start = time.perf_counter()
+        statuses = await login_burst(client, username, password, args.logins, args.concurrency)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        print(summary("GET / during login burst", await busy))
+        print(f"logins: {args.logins} in {elapsed:.2f}s ({args.logins / elapsed:.1f}/s) statuses={statuses}")
+        print(f"hashing pool: {(await client.get('/auth/hashing')).json()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Event loop latency during a login burst")
+    parser.add_argument("--url", default="http://localhost:8081")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between GET / probes")
+    parser.add_argument("--baseline", type=float, default=3, help="seconds of idle probing first")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#bench_login_throttle.py
+#
+# Latency of a legitimate user's logins while a credential-stuffing attack
+# sprays /token with guessed usernames from a few addresses. Without
+# throttling every guess costs a bcrypt verify and real logins queue behind
+# them (or get 503s from the hashing pool); with it the attack is answered
+# with 429s and real logins should stay near their idle latency.
+#
+# Each simulated client is told apart by X-Forwarded-For, so start the
+# service with LOGIN_TRUST_FORWARDED_FOR=true:
+#
+#   LOGIN_TRUST_FORWARDED_FOR=true poetry run uvicorn app.main:app --port 8081 --workers 1
+#   poetry run python -m benchmarks.bench_login_throttle --url http://localhost:8081 --duration 20
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def summary(label: str, latencies: list[float], statuses: dict[int, int]) -> str:
+    if not latencies:
+        return f"{label}: no requests"
+    latencies = sorted(latencies)
+    return (f"{label}: n={len(latencies)} p50={statistics.median(latencies) * 1000:.2f}ms "
+            f"p99={latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:.2f}ms "
+            f"max={latencies[-1] * 1000:.2f}ms statuses={statuses}")
+
+
+async def legitimate_logins(client: httpx.AsyncClient, username: str, password: str,
+                            stop: asyncio.Event, interval: float) -> tuple[list[float], dict[int, int]]:
+    latencies, statuses = [], {}
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.post("/token", data={"username": username, "password": password},
+                                     headers={"X-Forwarded-For": "10.0.0.1"})
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        await asyncio.sleep(interval)
+    return latencies, statuses
+
+
+async def attacker(client: httpx.AsyncClient, address: str, stop: asyncio.Event, statuses: dict[int, int]) -> None:
+    while not stop.is_set():
+        response = await client.post("/token", data={"username": f"guess-{uuid.uuid4().hex[:12]}",
+                                                     "password": "hunter2"},
+                                     headers={"X-Forwarded-For": address})
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def phase(client: httpx.AsyncClient, args: argparse.Namespace, username: str, password: str,
+                attack: bool) -> None:
+    stop = asyncio.Event()
+    attack_statuses: dict[int, int] = {}
+    attackers = [asyncio.create_task(attacker(client, f"203.0.113.{i % args.attack_clients + 1}", stop,
+                                              attack_statuses))
+                 for i in range(args.attack_concurrency if attack else 0)]
+    legit = asyncio.create_task(legitimate_logins(client, username, password, stop, args.interval))
+    await asyncio.sleep(args.duration)
+    stop.set()
+    latencies, statuses = await legit
+    await asyncio.gather(*attackers)
+    print(summary(f"legitimate logins {'under attack' if attack else 'idle'}", latencies, statuses))
+    if attack:
+        print(f"attack requests: {sum(attack_statuses.values())} statuses={attack_statuses}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    password = "correct horse battery staple"
+    limits = httpx.Limits(max_connections=args.attack_concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120) as client:
+        response = await client.post("/users/register", json={
+            "user_name": username, "user_email": f"{username}@example.com", "address": "Benchmark Street 1",
+            "phone_number": 5550100, "password": password})
+        response.raise_for_status()
+
+        await phase(client, args, username, password, attack=False)
+        await phase(client, args, username, password, attack=True)
+        print(f"throttle: {(await client.get('/auth/throttle')).json()}")
+        print(f"hashing pool: {(await client.get('/auth/hashing')).json()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Legitimate login latency during a credential-stuffing burst")
+    parser.add_argument("--url", default="http://localhost:8081")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per phase")
+    parser.add_argument("--interval", type=float, default=6,
+                        help="seconds between legitimate logins; keep under the per-username rate")
+    parser.add_argument("--attack-clients", type=int, default=5, help="distinct attacking addresses")
+    parser.add_argument("--attack-concurrency", type=int, default=100)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import uuid
+
+from app.bloom import BloomFilter
+
+
+def test_added_items_are_always_found()->None:
+    bloom = BloomFilter(capacity=10_000, fp_rate=0.001)
+    items = [uuid.uuid4().hex for _ in range(10_000)]
+    for item in items:
+        bloom.add(item)
+    assert all(bloom.might_contain(item) for item in items)
+
+
+def test_false_positive_rate_stays_near_target()->None:
+    bloom = BloomFilter(capacity=10_000, fp_rate=0.01)
+    for _ in range(10_000):
+        bloom.add(uuid.uuid4().hex)
+    false_positives = sum(bloom.might_contain(uuid.uuid4().hex) for _ in range(20_000))
+    assert false_positives / 20_000 < 0.02
+    assert abs(bloom.expected_fp_rate() - 0.01) < 0.005
+
+
+def test_sizing()->None:
+    bloom = BloomFilter(capacity=1_000_000, fp_rate=0.001)
+    # About 1.8 MB and 10 hashes for a million entries at 0.1%.
+    assert 1_700_000 < bloom.nbytes < 1_900_000
+    assert bloom.hashes == 10
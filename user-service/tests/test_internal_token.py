@@ -0,0 +1,21 @@
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import Secret
+
+from app import auth, settings
+
+
+def test_internal_routes_closed_without_token(monkeypatch)->None:
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", Secret(""))
+    with pytest.raises(HTTPException) as error:
+        auth.require_internal_token("")
+    assert error.value.status_code == 503
+
+
+def test_internal_token_must_match(monkeypatch)->None:
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", Secret("s3cret"))
+    auth.require_internal_token("s3cret")
+    for sent in ("", "wrong", "s3crét"):
+        with pytest.raises(HTTPException) as error:
+            auth.require_internal_token(sent)
+        assert error.value.status_code == 401
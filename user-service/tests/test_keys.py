@@ -0,0 +1,21 @@
+import pytest
+
+from app import settings
+from app.keys import KeyRing
+
+
+def test_startup_fails_without_keys(monkeypatch, tmp_path)->None:
+    monkeypatch.setattr(settings, "JWT_GENERATE_DEV_KEY", False)
+    with pytest.raises(RuntimeError):
+        KeyRing(str(tmp_path / "keys")).load()
+    assert not (tmp_path / "keys").exists()
+
+
+def test_dev_key_generated_when_opted_in(monkeypatch, tmp_path)->None:
+    monkeypatch.setattr(settings, "JWT_GENERATE_DEV_KEY", True)
+    ring = KeyRing(str(tmp_path / "keys"))
+    ring.load()
+    assert list(ring.public_keys) == [ring.signing_kid]
+    # Later loads, with the flag off, use the key now on disk.
+    monkeypatch.setattr(settings, "JWT_GENERATE_DEV_KEY", False)
+    KeyRing(str(tmp_path / "keys")).load()
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from app import revocation
+from app.models import RevokedToken
+from app.revocation import RevocationList
+
+
+class FakeSession:
+    def __init__(self, revoked: set[str]) -> None:
+        self.revoked = revoked
+        self.lookups = 0
+
+    async def get(self, model, jti: str):
+        self.lookups += 1
+        return RevokedToken(jti=jti) if jti in self.revoked else None
+
+
+def test_table_answers_until_filter_is_synced()->None:
+    revocations = RevocationList(capacity=100, fp_rate=0.01)
+    session = FakeSession({"revoked-elsewhere"})
+    assert asyncio.run(revocations.is_revoked(session, "revoked-elsewhere"))
+    assert not asyncio.run(revocations.is_revoked(session, "fine"))
+    assert session.lookups == 2
+
+    revocations.synced = True
+    assert not asyncio.run(revocations.is_revoked(session, "fine"))
+    assert session.lookups == 2
+
+
+def test_sync_retries_with_backoff(monkeypatch)->None:
+    revocations = RevocationList(capacity=100, fp_rate=0.01)
+    attempts, sleeps = [], []
+
+    class FailingConsumer:
+        def __init__(self, *args, **kwargs) -> None:
+            pass
+
+        async def start(self) -> None:
+            attempts.append(revocations.synced)
+            raise ConnectionError("broker unavailable")
+
+        async def stop(self) -> None:
+            pass
+
+    async def sleep(delay: float) -> None:
+        sleeps.append(delay)
+        if len(sleeps) == 4:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(revocation, "revocations", revocations)
+    monkeypatch.setattr(revocation, "AIOKafkaConsumer", FailingConsumer)
+    monkeypatch.setattr(revocation.asyncio, "sleep", sleep)
+    monkeypatch.setattr(revocation.settings, "REVOCATION_SYNC_RETRY_SECONDS", 1)
+    monkeypatch.setattr(revocation.settings, "REVOCATION_SYNC_RETRY_MAX_SECONDS", 5)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(revocation.sync_revocations("users", "broker:19092"))
+    assert sleeps == [1, 2, 4, 5]
+    assert attempts == [False] * 4
@@ -0,0 +1,36 @@
+from app import throttle
+from app.throttle import TokenBuckets
+
+
+def test_burst_then_refill(monkeypatch)->None:
+    now = 1000.0
+    monkeypatch.setattr(throttle.time, "monotonic", lambda: now)
+    buckets = TokenBuckets(rate=0.5, burst=3, max_entries=10)
+    assert [buckets.take("alice") for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("alice") == 2.0
+    assert buckets.take("bob") == 0
+    now += 2
+    assert buckets.take("alice") == 0
+    assert (buckets.allowed, buckets.throttled) == (5, 1)
+
+
+def test_sweep_drops_only_full_buckets(monkeypatch)->None:
+    now = 1000.0
+    monkeypatch.setattr(throttle.time, "monotonic", lambda: now)
+    buckets = TokenBuckets(rate=1, burst=5, max_entries=10)
+    buckets.take("old")
+    now += 3
+    buckets.take("recent")
+    now += 2
+    assert buckets.sweep() == 1
+    assert buckets.stats()["buckets"] == 1
+
+
+def test_oldest_bucket_evicted_past_max_entries()->None:
+    buckets = TokenBuckets(rate=1, burst=1, max_entries=2)
+    for key in ("a", "b", "c"):
+        buckets.take(key)
+    assert buckets.evictions == 1
+    # "a" was evicted, so it starts again from a full bucket.
+    assert buckets.take("a") == 0
+    assert buckets.take("c") > 0